@@ -1,4 +1,53 @@
-from .thermo.visualize import *
-from .thermo.io import *
+import importlib
 
-from .vaps.debug import *
\ No newline at end of file
+# Modules whose public names (their __all__) are imported into ACT
+_MODULES = [
+    '.thermo.io',
+    '.thermo.cache',
+    '.thermo.follow',
+    '.thermo.diurnal',
+    '.thermo.schema',
+    '.thermo.store',
+    '.thermo.rollup',
+    '.thermo.decimate',
+    '.thermo.report',
+    '.thermo.trace',
+    '.thermo.export',
+    '.thermo.xlsx',
+    '.thermo.prefetch',
+    '.thermo.qc',
+    '.thermo.window',
+    '.vaps.debug',
+    '.pam.io',
+]
+
+# The plotting modules import matplotlib, so they are only loaded the first time one of their
+# names is used; ingest-only code never pays for it
+_LAZY = {
+    'diurnal_plot': '.thermo.visualize',
+    'diurnal_plot_single': '.thermo.visualize',
+    'ThermoPlot': '.thermo.visualize',
+}
+
+__all__ = []
+for _name in _MODULES:
+    _module = importlib.import_module(_name, __name__)
+    globals().update((name, getattr(_module, name)) for name in _module.__all__)
+    __all__ += _module.__all__
+__all__ += list(_LAZY)
+
+del _name, _module
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+    value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1 @@
+from .io import *
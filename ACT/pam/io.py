@@ -0,0 +1,136 @@
+"""
+	Functions used to import data from the Potential Aerosol Mass (PAM) LabVIEW program and mesh it with analyzer data
+"""
+__all__ = ['read_pam', 'pam_periods', 'mesh_pam']
+
+import os
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+from ..thermo.io import get_files, _resample
+from ..thermo.ingest import parse_files, merge_frames
+from ..thermo.trace import stage
+from ..thermo.prefetch import as_source
+from ..vaps.debug import _clean_vaps
+
+
+def _parse_pam_txt(filename):
+    '''
+        Parses a single tab-separated file written by the PAM LabVIEW program
+    '''
+    return pd.read_table(as_source(filename), sep='\t', header=0, parse_dates=True, index_col='Date/Time', on_bad_lines='warn')
+
+
+def read_pam(runDir=os.getcwd(), sample_int=None, start=None, end=None, instrument='PAM', fileType='txt', processes=1, cache=None, prefetch=True):
+    '''
+    Reads the output files of the PAM LabVIEW program (files with `instrument` in their name and
+    extension `fileType`, found the same way as get_files) into one time-ordered DataFrame.
+    Short rows are dropped, rows repeated where files overlap are kept once, and the data is
+    resampled to `sample_int` unless it is None.
+    `processes` sets the number of worker processes used to parse the files (None uses one per cpu).
+    `cache` is a ParseCache (or directory for one) used to skip re-parsing files that have not changed.
+    `prefetch` reads the next files on threads while one is parsed (see read_data_vaps).
+
+    >>>pam = read_pam("C:/Users/David/Desktop/PAM Data/")
+    '''
+    with stage('get_files') as s:
+        files = get_files(instrument, fileType=fileType, runDir=runDir, start=start, end=end)
+        s.rows = len(files)
+
+    frames = parse_files([os.path.join(runDir, each) for each in files], _parse_pam_txt, processes=processes, cache=cache,
+                         prefetch=prefetch)
+
+    for i, each in enumerate(files):
+        with stage('clean', file=each, rows=len(frames[i])):
+            frames[i] = _clean_vaps(frames[i], each)
+
+    with stage('merge') as s:
+        data = merge_frames(frames).sort_index(kind='mergesort') if len(frames) > 0 else DataFrame(index=pd.DatetimeIndex([]))
+        s.rows = len(data)
+
+    if sample_int is not None:
+        with stage('resample', rows=len(data)):
+            data = _resample(data, sample_int)
+
+    return data
+
+
+def pam_periods(data, state, dropna=True):
+    '''
+    Splits PAM data into oxidation exposure periods: runs of consecutive rows with the same value
+    of the `state` column (e.g. the lamp setting). Returns a DataFrame with one row per period
+    holding its start, end, state and number of rows, sorted by start. Each period runs until the
+    next one starts (the last one until its last row). Periods where `state` is NaN are left out
+    if `dropna` is True.
+
+    >>>periods = pam_periods(pam, 'Lamp')
+    '''
+    values = data[state]
+    previous = values.shift()
+
+    # A new period starts wherever the state changes (NaN to NaN is not a change)
+    change = (values != previous) & ~(values.isnull() & previous.isnull())
+    change.iloc[:1] = True
+    starts = np.flatnonzero(change.values)
+
+    index = data.index
+    ends = np.append(index[starts[1:]].values, index[-1:].values + np.timedelta64(1, 'ns')) if len(starts) > 0 else []
+
+    periods = DataFrame({
+            'start': index[starts],
+            'end': pd.DatetimeIndex(ends),
+            'state': values.values[starts],
+            'rows': np.diff(np.append(starts, len(data))),
+        }, columns=['start', 'end', 'state', 'rows'])
+
+    if dropna:
+        periods = periods[periods['state'].notnull()]
+
+    periods.index = pd.RangeIndex(len(periods), name='period')
+
+    return periods
+
+
+def mesh_pam(data, periods, columns=['state']):
+    '''
+    Assigns every row of `data` (e.g. analyzer data from read_thermo_dat) to the PAM period it
+    falls in, adding a 'period' column (-1 where no period covers the row) and the `columns` of
+    `periods` (NaN where no period covers the row). `periods` is a DataFrame with start and end
+    columns like pam_periods returns; periods are [start, end) and must not overlap.
+
+    The period starts are sorted once and every timestamp is placed with one binary search, so
+    millions of rows take a fraction of a second.
+
+    >>>periods = pam_periods(pam, 'Lamp')
+    >>>meshed = mesh_pam(nox, periods)
+    >>>meshed.groupby('state')['nox'].mean()
+    '''
+    if len(periods) == 0:
+        return data.assign(period=-1, **dict((col, np.nan) for col in columns))
+
+    periods = periods.sort_values('start', kind='mergesort')
+    starts = pd.DatetimeIndex(periods['start']).asi8
+    ends = pd.DatetimeIndex(periods['end']).asi8
+
+    times = data.index.asi8
+    position = np.searchsorted(starts, times, side='right') - 1
+
+    inside = position >= 0
+    inside[inside] = times[inside] < ends[position[inside]]
+    position = np.where(inside, position, -1)
+
+    labels = np.asarray(periods.index)
+    added = {'period': np.where(inside, labels[position], -1)}
+    for col in columns:
+        values = periods[col].values
+        if values.dtype.kind in 'biu':
+            values = values.astype(np.float64)
+
+        taken = values[np.maximum(position, 0)]
+        if not inside.all():
+            taken = taken.astype(np.float64) if taken.dtype.kind == 'f' else taken.astype(object)
+            taken[~inside] = np.nan
+        added[col] = taken
+
+    return data.assign(**added)
@@ -0,0 +1,250 @@
+"""
+	On-disk cache of parsed data files stored in a binary columnar (.npz) format
+"""
+__all__ = ['ParseCache']
+
+import os
+import hashlib
+import warnings
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+# Bump this whenever the layout of the cached files changes so old entries are re-parsed
+CACHE_VERSION = 1
+
+
+def _to_strings(values):
+    '''
+        Converts an object array to a fixed width unicode array plus a mask of the missing values
+    '''
+    mask = pd.isnull(values)
+    strings = np.array(['' if m else str(v) for v, m in zip(values, mask)], dtype=np.str_)
+
+    return strings, np.asarray(mask, dtype=bool)
+
+
+def _from_strings(strings, mask):
+    values = strings.astype(object)
+    values[mask] = np.nan
+
+    return values
+
+
+def _pack(name, values, arrays):
+    '''
+        Adds the array(s) needed to rebuild `values` to `arrays` under the prefix `name`
+    '''
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        arrays[name] = np.asarray(values.codes)
+        arrays[name + '.categories'], arrays[name + '.mask'] = _to_strings(np.asarray(values.categories, dtype=object))
+    elif isinstance(values, np.ndarray) and values.dtype.kind in 'biufcmM':
+        arrays[name] = values
+    else:
+        # Strings and anything else that numpy would need to pickle
+        arrays[name], arrays[name + '.mask'] = _to_strings(np.asarray(values, dtype=object))
+
+
+def _unpack(name, npz):
+    values = npz[name]
+
+    if name + '.categories' in npz.files:
+        categories = _from_strings(npz[name + '.categories'], npz[name + '.mask'])
+        return pd.Categorical.from_codes(values, categories)
+    elif name + '.mask' in npz.files:
+        return _from_strings(values, npz[name + '.mask'])
+
+    return values
+
+
+def write_frame(filename, data, meta={}):
+    '''
+        Writes `data` to `filename` as an uncompressed .npz archive with one array per column so
+        single columns can be read back without touching the rest of the file. Extra metadata
+        can be stored with the frame through `meta`.
+    '''
+    arrays = {}
+    _pack('index', data.index.values, arrays)
+    arrays['index.name'] = np.array('' if data.index.name is None else str(data.index.name))
+    arrays['columns'] = np.array([str(c) for c in data.columns], dtype=np.str_)
+
+    for i, col in enumerate(data.columns):
+        _pack('c%d' % i, data.iloc[:, i].values, arrays)
+
+    for key, val in meta.items():
+        arrays['meta.%s' % key] = np.array(val)
+
+    # Write to a temporary file first so a crash never leaves half of a frame behind
+    tmp = '%s.%d.tmp' % (filename, os.getpid())
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, filename)
+
+
+def read_meta(filename):
+    '''
+        Returns the metadata stored with a frame by `write_frame`
+    '''
+    with np.load(filename) as npz:
+        return dict((key[5:], npz[key][()]) for key in npz.files if key.startswith('meta.'))
+
+
+def read_frame(filename, columns=None):
+    '''
+        Reads a frame written by `write_frame`. If `columns` is set, only those columns are read
+        from the file.
+    '''
+    with np.load(filename) as npz:
+        names = list(npz['columns'])
+        if columns is None:
+            columns = names
+
+        data = {}
+        for col in columns:
+            if col in names:
+                data[col] = _unpack('c%d' % names.index(col), npz)
+
+        index = pd.Index(_unpack('index', npz))
+        name = str(npz['index.name'][()])
+        index.name = name if name != '' else None
+
+    return DataFrame(data, index=index, columns=[c for c in columns if c in names])
+
+
+class ParseCache():
+    '''
+        Keeps the parsed contents of raw data files in `cacheDir` so they only need to be
+        tokenized once. Each entry is keyed by the absolute path of the file and the parser used
+        to read it, and is only reused while the size and modification time of the file are
+        unchanged.
+
+        >>> cache = ParseCache("C:/Users/David/Dropbox/SLAQRS/.actcache")
+        >>> files, nox = read_thermo_dat('nox', runDir, cache=cache)
+        >>> cache.info()
+        >>> cache.purge(stale_only=True)
+    '''
+
+    def __init__(self, cacheDir):
+        self.cacheDir = os.path.abspath(cacheDir)
+
+        if not os.path.isdir(self.cacheDir):
+            os.makedirs(self.cacheDir)
+
+    def _entry(self, filename, parser):
+        key = '%s|%s.%s|%d' % (os.path.abspath(filename), parser.__module__, parser.__name__, CACHE_VERSION)
+        return os.path.join(self.cacheDir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz')
+
+    def _current(self, entry, st):
+        meta = read_meta(entry)
+        return meta['size'] == st.st_size and meta['mtime'] == st.st_mtime_ns
+
+    def fresh(self, filename, parser):
+        '''
+            Returns True if the cache holds the contents of `filename` as it is now
+        '''
+        entry = self._entry(filename, parser)
+        try:
+            return os.path.exists(entry) and self._current(entry, os.stat(filename))
+        except Exception:
+            return False
+
+    def load(self, filename, parser, contents=None):
+        '''
+            Returns the parsed contents of `filename`, reading them from the cache if the file has
+            not changed since it was cached and parsing (and caching) it with `parser` otherwise.
+            If the raw `contents` (bytes) of the file have already been read, `parser` is given
+            them instead of the filename, and they are only cached if they are known to match
+            the size and modification time they are cached under.
+        '''
+        # Contents read ahead by a Prefetch carry the stat of the file taken before they were read
+        st = getattr(contents, 'stat', None) or os.stat(filename)
+        entry = self._entry(filename, parser)
+
+        if os.path.exists(entry):
+            try:
+                if self._current(entry, st):
+                    return read_frame(entry)
+            except Exception:
+                warnings.warn("Could not read the cache entry for %s; parsing it again" % filename)
+
+        data = parser(filename if contents is None else contents)
+
+        if contents is not None and len(contents) != st.st_size:
+            # The file changed between the stat and the read; cache it next time
+            return data
+
+        try:
+            write_frame(entry, data, meta={
+                    'source': os.path.abspath(filename),
+                    'parser': '%s.%s' % (parser.__module__, parser.__name__),
+                    'size': st.st_size,
+                    'mtime': st.st_mtime_ns,
+                })
+        except Exception:
+            warnings.warn("Could not cache the parsed contents of %s" % filename)
+
+        return data
+
+    def _entries(self):
+        return sorted(os.path.join(self.cacheDir, each) for each in os.listdir(self.cacheDir) if each.endswith('.npz'))
+
+    def info(self):
+        '''
+            Returns a DataFrame describing every entry in the cache: the source file, the parser
+            used, the size and mtime of the source when it was cached, the size of the entry and
+            whether it is stale (the source has since changed or been removed).
+        '''
+        rows = []
+        for entry in self._entries():
+            try:
+                meta = read_meta(entry)
+            except Exception:
+                continue
+
+            source = str(meta['source'])
+            try:
+                st = os.stat(source)
+                stale = st.st_size != meta['size'] or st.st_mtime_ns != meta['mtime']
+            except OSError:
+                stale = True
+
+            rows.append({
+                    'entry': entry,
+                    'source': source,
+                    'parser': str(meta['parser']),
+                    'size': int(meta['size']),
+                    'mtime': pd.to_datetime(int(meta['mtime']), unit='ns'),
+                    'bytes': os.path.getsize(entry),
+                    'stale': stale,
+                })
+
+        return DataFrame(rows, columns=['entry', 'source', 'parser', 'size', 'mtime', 'bytes', 'stale'])
+
+    def purge(self, stale_only=False):
+        '''
+            Deletes every entry in the cache, or only the stale ones if `stale_only` is True.
+            Returns the number of entries removed.
+        '''
+        if stale_only:
+            info = self.info()
+            entries = info['entry'][info['stale']].tolist()
+        else:
+            entries = self._entries()
+
+        for entry in entries:
+            os.remove(entry)
+
+        return len(entries)
+
+    def __len__(self):
+        return len(self._entries())
+
+
+def as_cache(cache):
+    '''
+        Allows readers to accept either a ParseCache or the directory to keep one in
+    '''
+    if cache is None or isinstance(cache, ParseCache):
+        return cache
+
+    return ParseCache(cache)
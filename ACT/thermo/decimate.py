@@ -0,0 +1,101 @@
+"""
+	Reduce long time series to about the resolution of a plot before drawing them
+"""
+__all__ = ['decimate', 'minmax', 'lttb']
+
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+# Series with more points than this are decimated before they are plotted
+MAX_POINTS = 4000
+
+
+def _buckets(n, count):
+    # Edges of `count` buckets of (almost) the same number of points between the first and last point
+    return np.linspace(1, n - 1, count + 1).astype(np.int64)
+
+
+def minmax(series, max_points=MAX_POINTS):
+    '''
+        Returns the points of `series` at the min and max of each of max_points/2 buckets, plus the
+        first and last point, in time order. Every spike and dip survives, and buckets that only
+        hold NaN keep one NaN so gaps still show up as gaps.
+    '''
+    n = len(series)
+    if n <= max_points or max_points < 4:
+        return series
+
+    values = np.asarray(series, dtype=np.float64)
+    count = (max_points - 2) // 2
+    size = -(-(n - 2) // count)
+    count = -(-(n - 2) // size)
+
+    # Pad the inner points to a (count, size) block; padding never wins a min or max
+    inner = np.full(count * size, np.nan)
+    inner[:n - 2] = values[1:-1]
+    inner = inner.reshape(count, size)
+
+    lo = np.argmin(np.where(np.isnan(inner), np.inf, inner), axis=1)
+    hi = np.argmax(np.where(np.isnan(inner), -np.inf, inner), axis=1)
+
+    base = np.arange(count) * size + 1
+    positions = np.unique(np.concatenate([[0], base + lo, base + hi, [n - 1]]))
+
+    return series.iloc[positions]
+
+
+def lttb(series, max_points=MAX_POINTS):
+    '''
+        Returns `max_points` points of `series` picked with the Largest-Triangle-Three-Buckets
+        algorithm, which keeps the visual shape of the line. NaN values are left out.
+    '''
+    series = series[series.notnull()]
+    n = len(series)
+    if n <= max_points or max_points < 3:
+        return series
+
+    x = np.asarray(series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else series.index, dtype=np.float64)
+    y = np.asarray(series, dtype=np.float64)
+    edges = _buckets(n, max_points - 2)
+
+    positions = np.empty(max_points, dtype=np.int64)
+    positions[0], positions[-1] = 0, n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+
+        # Average of the next bucket (or the last point) is the third corner of the triangle
+        if i < max_points - 3:
+            nx, ny = x[hi:edges[i + 2]].mean(), y[hi:edges[i + 2]].mean()
+        else:
+            nx, ny = x[-1], y[-1]
+
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + np.argmax(area)
+        positions[i + 1] = a
+
+    return series.iloc[positions]
+
+
+def decimate(data, max_points=MAX_POINTS, method='minmax'):
+    '''
+        Returns `data` (a Series, or every column of a DataFrame) reduced to about `max_points`
+        points with `method` ('minmax' or 'lttb'), or unchanged if it is already short enough or
+        `method` is None. A DataFrame comes back as a dict of Series since each column keeps
+        different points.
+
+        >>> decimate(data['nox'], max_points=2000).plot()
+    '''
+    if method is None:
+        return data
+
+    if method not in ('minmax', 'lttb'):
+        raise ValueError("Unknown decimation method: %s" % method)
+
+    reduce = minmax if method == 'minmax' else lttb
+    if isinstance(data, DataFrame):
+        return dict((col, reduce(data[col], max_points)) for col in data.columns)
+
+    return reduce(data, max_points)
@@ -0,0 +1,175 @@
+"""
+	Mergeable aggregation of diurnal (time of day) profiles of trace gas data
+"""
+__all__ = ['DiurnalProfile']
+
+import warnings
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+MINUTES = 24 * 60
+
+# Range of the histogram used for the quantiles of each species (ppb); anything else uses DEFAULT_RANGE
+RANGES = {
+    'no': (0., 500.),
+    'no2': (0., 500.),
+    'nox': (0., 500.),
+    'so2': (0., 100.),
+    'sox': (0., 100.),
+    'o3': (0., 200.),
+}
+DEFAULT_RANGE = (0., 1000.)
+
+
+class DiurnalProfile():
+    '''
+        Builds the diurnal profile (statistics for each minute of the day) of one or more species.
+        The count, sum, sum of squares, min and max of every minute are kept exactly, and the
+        quantiles come from a fixed-bin histogram per minute, so profiles built from different
+        chunks, months or years of data can be merged without going back to the data.
+
+        `bins` sets the number of histogram bins per minute and `ranges` overrides the histogram
+        range of a species (values outside of it are counted in the first/last bin).
+
+        >>> profile = DiurnalProfile(['nox', 'so2', 'o3'])
+        >>> for chunk in iter_thermo_dat('nox', runDir):
+        ...    profile.update(chunk)
+        >>> stats = profile.result()
+        >>> stats['nox']['mean']
+    '''
+
+    def __init__(self, species, bins=1000, ranges={}):
+        if isinstance(species, str):
+            species = [species]
+
+        self.species = list(species)
+        self.bins = bins
+        self.ranges = dict((sp, tuple(ranges.get(sp, RANGES.get(sp.lower(), DEFAULT_RANGE)))) for sp in self.species)
+
+        self.count = dict((sp, np.zeros(MINUTES, dtype=np.int64)) for sp in self.species)
+        self.sum = dict((sp, np.zeros(MINUTES)) for sp in self.species)
+        self.sumsq = dict((sp, np.zeros(MINUTES)) for sp in self.species)
+        self.min = dict((sp, np.full(MINUTES, np.inf)) for sp in self.species)
+        self.max = dict((sp, np.full(MINUTES, -np.inf)) for sp in self.species)
+        self.hist = dict((sp, np.zeros((MINUTES, bins), dtype=np.int64)) for sp in self.species)
+
+    def update(self, data):
+        '''
+            Adds the rows of `data` (a DataFrame with a DatetimeIndex) to the profile. Species that
+            are not columns of `data` are skipped, with a warning if none of them are. Returns the
+            profile.
+        '''
+        if len(data) > 0 and not any(sp in data.columns for sp in self.species):
+            warnings.warn("None of %s are columns of the data; the diurnal profile is unchanged" % (self.species,))
+
+        minutes = np.asarray(data.index.hour * 60 + data.index.minute, dtype=np.int64)
+
+        for sp in self.species:
+            if sp not in data.columns:
+                continue
+
+            values = np.asarray(data[sp], dtype=np.float64)
+            valid = np.isfinite(values)
+            m, v = minutes[valid], values[valid]
+
+            self.count[sp] += np.bincount(m, minlength=MINUTES)
+            self.sum[sp] += np.bincount(m, weights=v, minlength=MINUTES)
+            self.sumsq[sp] += np.bincount(m, weights=v * v, minlength=MINUTES)
+            np.minimum.at(self.min[sp], m, v)
+            np.maximum.at(self.max[sp], m, v)
+
+            lo, hi = self.ranges[sp]
+            b = np.clip(((v - lo) * (self.bins / (hi - lo))).astype(np.int64), 0, self.bins - 1)
+            self.hist[sp] += np.bincount(m * self.bins + b, minlength=MINUTES * self.bins).reshape(MINUTES, self.bins)
+
+        return self
+
+    def merge(self, other):
+        '''
+            Adds the data of another DiurnalProfile (built with the same bins and ranges) to this one.
+            Returns the profile.
+        '''
+        for sp in other.species:
+            if sp not in self.species:
+                raise ValueError("Can not merge profiles of different species: %s" % sp)
+            if other.bins != self.bins or other.ranges[sp] != self.ranges[sp]:
+                raise ValueError("Can not merge profiles with different histograms for %s" % sp)
+
+            self.count[sp] += other.count[sp]
+            self.sum[sp] += other.sum[sp]
+            self.sumsq[sp] += other.sumsq[sp]
+            self.min[sp] = np.minimum(self.min[sp], other.min[sp])
+            self.max[sp] = np.maximum(self.max[sp], other.max[sp])
+            self.hist[sp] += other.hist[sp]
+
+        return self
+
+    def quantile(self, species, q):
+        '''
+            Returns the `q` quantile of `species` for every minute of the day, interpolated within
+            the histogram bin it falls in
+        '''
+        hist = self.hist[species]
+        count = self.count[species]
+        lo, hi = self.ranges[species]
+        width = (hi - lo) / self.bins
+
+        cdf = np.cumsum(hist, axis=1)
+        target = q * count
+
+        # First bin whose cumulative count reaches the target
+        b = np.minimum((cdf < target[:, None]).sum(axis=1), self.bins - 1)
+        rows = np.arange(MINUTES)
+        below = cdf[rows, b] - hist[rows, b]
+        inbin = hist[rows, b]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frac = np.where(inbin > 0, (target - below) / inbin, 0.)
+            values = lo + (b + frac) * width
+
+            # The exact min and max are known, so never go past them
+            values = np.clip(values, self.min[species], self.max[species])
+
+        values[count == 0] = np.nan
+        return values
+
+    def result(self, quantiles=(0.25, 0.5, 0.75)):
+        '''
+            Returns a DataFrame indexed by minute of the day with a (species, statistic) column for
+            count, mean, std, min, the requested quantiles and max, like DataFrame.describe().
+            Minutes without any data are left out.
+        '''
+        columns = {}
+        for sp in self.species:
+            count = self.count[sp]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = self.sum[sp] / count
+                var = (self.sumsq[sp] - count * mean * mean) / (count - 1)
+
+            columns[(sp, 'count')] = count.astype(np.float64)
+            columns[(sp, 'mean')] = mean
+            columns[(sp, 'std')] = np.sqrt(np.maximum(var, 0.))
+            columns[(sp, 'min')] = np.where(count > 0, self.min[sp], np.nan)
+            for q in quantiles:
+                columns[(sp, '%g%%' % (q * 100))] = self.quantile(sp, q)
+            columns[(sp, 'max')] = np.where(count > 0, self.max[sp], np.nan)
+
+        stats = ['count', 'mean', 'std', 'min'] + ['%g%%' % (q * 100) for q in quantiles] + ['max']
+        result = DataFrame(columns, index=pd.Index(np.arange(MINUTES), name='minute'),
+                           columns=pd.MultiIndex.from_tuples([(sp, st) for sp in self.species for st in stats]))
+
+        present = np.zeros(MINUTES, dtype=bool)
+        for sp in self.species:
+            present |= self.count[sp] > 0
+
+        return result[present]
+
+    def profile(self, quantiles=(0.25, 0.5, 0.75)):
+        '''
+            Same as result() but indexed by today's date at each minute, ready to be plotted
+        '''
+        result = self.result(quantiles=quantiles)
+        result.index = pd.Timestamp.today().normalize() + pd.to_timedelta(result.index, unit='m')
+
+        return result
@@ -0,0 +1,255 @@
+"""
+	Functions used to export thermo scientific analyzer data in chunks to csv, txt, xlsx and columnar files
+"""
+__all__ = ['write_frames', 'export_thermo']
+
+import os
+import gzip
+import warnings
+import multiprocessing
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+from .io import iter_thermo_dat, _get_instrument
+from .trace import stage
+from .timerange import time_bounds
+
+# Rows per worksheet in an .xlsx workbook, including the header row
+EXCEL_ROWS = 1048576
+
+FORMATS = ['csv', 'txt', 'xlsx', 'parquet', 'feather']
+EXTENSIONS = {'csv': 'csv', 'txt': 'txt', 'xlsx': 'xlsx', 'parquet': 'parquet', 'feather': 'feather'}
+COMPRESSIONS = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+
+def _format(filename):
+    '''
+        Guesses the format and compression of `filename` from its extension
+    '''
+    name = filename.lower()
+    compression = None
+    for key, ext in COMPRESSIONS.items():
+        if key is not None and name.endswith(ext):
+            compression = key
+            name = name[:-len(ext)]
+
+    fmt = os.path.splitext(name)[1].lstrip('.')
+    if fmt not in FORMATS:
+        raise ValueError("Can not tell the export format of %s; options are %s" % (filename, FORMATS))
+
+    return fmt, compression
+
+
+def _open_text(filename, compression):
+    if compression is None:
+        return open(filename, 'w', newline='')
+    if compression == 'gzip':
+        return gzip.open(filename, 'wt', newline='')
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression needs the zstandard package")
+        return zstandard.open(filename, 'wt', newline='')
+
+    raise ValueError("Unknown compression %s; options are %s" % (compression, list(COMPRESSIONS)))
+
+
+def _write_text(chunks, filename, sep, compression):
+    rows = 0
+    with _open_text(filename, compression) as f:
+        for chunk in chunks:
+            chunk.to_csv(f, sep=sep, header=rows == 0)
+            rows += len(chunk)
+
+    return rows
+
+
+def _write_xlsx(chunks, filename, sheetname):
+    '''
+        Writes the chunks row by row with xlsxwriter's constant memory mode, which flushes each row
+        to disk as soon as the next one starts. A new worksheet ("<sheetname>_2", ...) is started
+        whenever one is full.
+    '''
+    try:
+        import xlsxwriter
+    except ImportError:
+        raise ImportError("Exporting to .xlsx needs the xlsxwriter package")
+
+    workbook = xlsxwriter.Workbook(filename, {'constant_memory': True})
+    dates = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+
+    sheet = None
+    sheets = 0
+    row = EXCEL_ROWS
+    rows = 0
+    try:
+        for chunk in chunks:
+            # Blank cells for NaN; xlsxwriter can not write NaN as a number
+            values = chunk.astype(object).where(chunk.notnull(), None).values.tolist()
+            index = chunk.index.to_pydatetime() if isinstance(chunk.index, pd.DatetimeIndex) else chunk.index.tolist()
+            header = [chunk.index.name or ''] + [str(col) for col in chunk.columns]
+
+            for stamp, each in zip(index, values):
+                if row == EXCEL_ROWS:
+                    sheets += 1
+                    sheet = workbook.add_worksheet(sheetname if sheets == 1 else '%s_%d' % (sheetname, sheets))
+                    sheet.set_column(0, 0, 20)
+                    sheet.write_row(0, 0, header)
+                    row = 1
+
+                sheet.write_datetime(row, 0, stamp, dates)
+                sheet.write_row(row, 1, each)
+                row += 1
+
+            rows += len(chunk)
+    finally:
+        workbook.close()
+
+    return rows
+
+
+def _write_arrow(chunks, filename, fmt):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import pyarrow.ipc as ipc
+    except ImportError:
+        raise ImportError("Exporting to .%s needs the pyarrow package" % fmt)
+
+    writer = None
+    schema = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=True)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(filename, schema) if fmt == 'parquet' else ipc.new_file(filename, schema)
+            else:
+                # Later chunks may infer slightly different types (e.g. an all-NaN column)
+                table = table.cast(schema)
+
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return rows
+
+
+def write_frames(chunks, filename, fmt=None, compression=None, sheetname='Sheet1'):
+    '''
+        Writes an iterable of DataFrames (e.g. the chunks yielded by iter_thermo_dat) to one file,
+        one chunk at a time, and returns the number of rows written.
+        fmt = csv, txt (tab-separated), xlsx, parquet or feather; guessed from the extension of
+            `filename` (including .gz and .zst) if None
+        compression = None, 'gzip' or 'zstd' for csv and txt files (zstd needs zstandard)
+
+        .xlsx files are written with xlsxwriter in constant memory mode and spill over into new
+        worksheets at Excel's row limit; parquet and feather files need pyarrow.
+
+        >>>write_frames(iter_thermo_dat('nox', runDir=dataDir), 'nox.csv.gz')
+    '''
+    if isinstance(chunks, DataFrame):
+        chunks = [chunks]
+
+    if fmt is None:
+        fmt, guessed = _format(filename)
+        compression = compression or guessed
+
+    if fmt not in FORMATS:
+        raise ValueError("Unknown export format %s; options are %s" % (fmt, FORMATS))
+
+    if fmt in ('csv', 'txt'):
+        return _write_text(chunks, filename, ',' if fmt == 'csv' else '\t', compression)
+
+    if compression is not None:
+        warnings.warn("Compression is only used for csv and txt exports")
+
+    if fmt == 'xlsx':
+        return _write_xlsx(chunks, filename, sheetname)
+
+    return _write_arrow(chunks, filename, fmt)
+
+
+def _periods(start, end, period):
+    if period is None:
+        return [(start, end)]
+
+    return [(max(each.start_time, start), min(each.end_time, end)) for each in pd.period_range(start, end, freq=period)]
+
+
+def _export_task(task):
+    '''
+        Exports one instrument over one period. Runs in a worker process, so it only takes plain values.
+    '''
+    model, runDir, filename, lo, hi, fmt, compression, sample_int, chunksize, cache = task
+
+    # The files dated the day before may run past midnight
+    chunks = iter_thermo_dat(model, runDir, sample_int=sample_int, start=lo.normalize() - pd.Timedelta('1D'), end=hi,
+                             chunksize=chunksize, cache=cache)
+    chunks = (chunk.loc[lo:hi] for chunk in chunks)
+
+    with stage('export', file=filename) as s:
+        rows = write_frames((chunk for chunk in chunks if len(chunk) > 0), filename, fmt=fmt, compression=compression)
+        s.rows = rows
+
+    # Leave no empty files behind for periods without data
+    if rows == 0 and os.path.exists(filename):
+        os.remove(filename)
+
+    return filename, rows
+
+
+def export_thermo(models, runDir, outDir, start, end, fmt='csv', compression=None, period=None, sample_int='1min',
+                  chunksize=500000, processes=None, cache=None):
+    '''
+        Exports the data of each analyzer in `models` between `start` and `end` to `outDir`, reading
+        the files with iter_thermo_dat so no more than `chunksize` raw rows are held at a time.
+        fmt = csv, txt, xlsx, parquet or feather (see write_frames)
+        compression = None, 'gzip' or 'zstd' for csv and txt
+        period = split the export into one file per period, e.g. 'D', 'W' or 'M' (None for one file)
+        processes = number of worker processes, one instrument and period per task (None uses one per cpu)
+
+        Files are named "<instrument>_<first day>.<ext>". Returns a dict of the rows written to each
+        file; periods without data get no file.
+
+        >>>export_thermo(['nox', 'sox', 'o3'], dataDir, "C:/Users/David/Desktop/export", '8-1-2013', '8-31-2013',
+        ...              fmt='csv', compression='gzip', period='W')
+    '''
+    if isinstance(models, str):
+        models = [models]
+
+    if fmt not in FORMATS:
+        raise ValueError("Unknown export format %s; options are %s" % (fmt, FORMATS))
+
+    if not os.path.isdir(outDir):
+        os.makedirs(outDir)
+
+    start, end = time_bounds(start, end)
+
+    tasks = []
+    for model in models:
+        instrument = _get_instrument(model)
+        for lo, hi in _periods(start, end, period):
+            filename = os.path.join(outDir, '%s_%s.%s%s' % (instrument, lo.strftime('%Y-%m-%d'), EXTENSIONS[fmt],
+                                                          COMPRESSIONS[compression] if fmt in ('csv', 'txt') else ''))
+            tasks.append((model, runDir, filename, lo, hi, fmt, compression, sample_int, chunksize, cache))
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if processes <= 1 or len(tasks) <= 1:
+        results = [_export_task(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        try:
+            results = pool.map(_export_task, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    return dict((filename, rows) for filename, rows in results if rows > 0)
@@ -0,0 +1,122 @@
+"""
+	Follow the .dat files of thermo scientific analyzers while they are being written
+"""
+__all__ = ['ThermoFollower']
+
+import os
+import pandas as pd
+from pandas import Series, DataFrame
+
+from .io import get_files, _get_instrument, _resample
+from .dat import read_dat_header, parse_dat_lines
+from .ingest import merge_frames
+
+
+class ThermoFollower():
+    '''
+        Keeps track of how far each .dat file of an analyzer has been read so every refresh only
+        parses the complete lines appended since the last one. Files that are rotated (replaced)
+        or truncated are read again from the top, and rows that were already seen are dropped.
+
+        refresh() returns the resample bins touched by the new data. The first bin may update the
+        last bin returned by the previous refresh, since it was still being filled.
+
+        >>> follower = ThermoFollower('nox', runDir=dataDir)
+        >>> data = follower.refresh()
+        >>> update = follower.refresh()
+        >>> data = pd.concat([data[data.index < update.index[0]], update])
+    '''
+
+    def __init__(self, model='nox', runDir=os.getcwd(), sample_int='1min', start=None):
+        self.model = model
+        self.instrument = _get_instrument(model)
+        self.runDir = runDir
+        self.sample_int = sample_int
+        self.start = start
+
+        # path -> {'inode', 'offset', 'columns'}
+        self.files = {}
+
+        # raw rows of the most recent (still open) resample bin and the newest timestamp read
+        self.tail = None
+        self.last = None
+        self.origin = None
+
+    def _read_new(self, path):
+        '''
+            Returns the complete rows appended to `path` since it was last read, or None
+        '''
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.files.pop(path, None)
+            return None
+
+        state = self.files.get(path)
+        if state is None or state['inode'] != st.st_ino or st.st_size < state['offset']:
+            # New, rotated or truncated file: start again from the top
+            state = self.files[path] = {'inode': st.st_ino, 'offset': 0, 'columns': None}
+
+        if st.st_size == state['offset']:
+            return None
+
+        with open(path, 'rb') as f:
+            if state['columns'] is None:
+                header = read_dat_header(f)
+                if header is None:
+                    return None
+                state['columns'], state['offset'] = header
+
+            f.seek(state['offset'])
+            buf = f.read(st.st_size - state['offset'])
+
+        # Only parse up to the last complete line; the rest is picked up next time
+        end = buf.rfind(b'\n')
+        if end < 0:
+            return None
+        state['offset'] += end + 1
+
+        return parse_dat_lines(buf[:end + 1], state['columns'])
+
+    def refresh(self):
+        '''
+            Reads whatever has been appended to the analyzer files since the last refresh and
+            returns it resampled to `sample_int`. Returns an empty DataFrame if nothing new was
+            written.
+        '''
+        files = get_files(self.instrument, fileType='dat', start=self.start, runDir=self.runDir)
+
+        frames = []
+        for each in files:
+            newData = self._read_new(os.path.join(self.runDir, each))
+            if newData is not None and len(newData) > 0:
+                frames.append(newData)
+
+        if len(frames) == 0:
+            return DataFrame()
+
+        data = merge_frames(frames).sort_index(kind='mergesort')
+
+        # Drop anything that was already read (e.g. a rotated file read from the top again)
+        if self.last is not None:
+            data = data[data.index > self.last]
+
+        if len(data) == 0:
+            return DataFrame()
+
+        self.last = data.index[-1]
+        if self.origin is None:
+            self.origin = data.index[0].normalize()
+
+        if self.model == 'nox':
+            data['no2'] = data['nox'] - data['no']
+
+        if self.tail is not None:
+            data = pd.concat([self.tail, data])
+
+        resampled = _resample(data, self.sample_int, origin=self.origin)
+
+        # Keep the rows of the last bin around since it may still be filling up
+        self.tail = data[data.index >= resampled.index[-1]]
+
+        return resampled
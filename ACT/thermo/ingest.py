@@ -0,0 +1,282 @@
+"""
+	Engine used to parse many data files and gather them into one DataFrame
+"""
+__all__ = ['read_files', 'merge_frames']
+
+import os
+import time
+import bisect
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from pandas.api.types import union_categoricals
+
+from .cache import as_cache
+from .schema import apply_schema
+from .prefetch import as_prefetch
+from . import trace
+
+
+class _Parser():
+    '''
+        Wraps a parser so each file is read through a ParseCache and/or converted to the compact
+        schema of an instrument. Only holds the cache directory, the parser and the instrument
+        name, so it can be sent to worker processes. `contents` are the bytes of the file if they
+        have already been read.
+    '''
+
+    def __init__(self, parser, cache=None, schema=None):
+        self.parser = parser
+        self.cache = cache
+        self.schema = schema
+
+    def __call__(self, filename, contents=None):
+        if self.cache is not None:
+            data = self.cache.load(filename, self.parser, contents=contents)
+        else:
+            data = self.parser(filename if contents is None else contents)
+
+        if self.schema is not None:
+            data = apply_schema(data, self.schema)
+
+        return data
+
+
+def _wrap(parser, cache=None, schema=None):
+    cache = as_cache(cache)
+    if cache is None and schema is None:
+        return parser
+
+    return _Parser(parser, cache=cache, schema=schema)
+
+
+class _Timed():
+    '''
+        Wraps a parser sent to worker processes so each returns how long its file took to parse
+    '''
+
+    def __init__(self, parser):
+        self.parser = parser
+
+    def __call__(self, filename):
+        start = time.perf_counter()
+        data = self.parser(filename)
+
+        return data, (start, time.perf_counter() - start, os.getpid(), threading.get_ident())
+
+
+def _size(filename):
+    try:
+        return os.path.getsize(filename)
+    except (OSError, TypeError):
+        return None
+
+
+def _call(parser, filename, contents):
+    if contents is None:
+        return parser(filename)
+    if isinstance(parser, _Parser):
+        return parser(filename, contents)
+
+    return parser(contents)
+
+
+def _parse(parser, filename, contents=None):
+    # Parse one file (from its contents if they have been read already), timing it if a Tracer is active
+    if not trace.tracing():
+        return _call(parser, filename, contents)
+
+    with trace.stage('parse', file=filename, bytes=_size(filename) if contents is None else len(contents)) as s:
+        data = _call(parser, filename, contents)
+        s.rows = len(data)
+
+    return data
+
+
+def _iter_contents(files, parser, prefetch):
+    '''
+        Yields each file with its contents read ahead by `prefetch`, or with None if it is not set.
+        Files a ParseCache already holds are not read.
+    '''
+    prefetch = as_prefetch(prefetch)
+    if prefetch is None:
+        return ((each, None) for each in files)
+
+    skip = None
+    if isinstance(parser, _Parser) and parser.cache is not None:
+        skip = lambda filename: parser.cache.fresh(filename, parser.parser)
+
+    return prefetch.iter(files, skip=skip)
+
+
+def concat(frames):
+    '''
+        Concatenates `frames` in one go. Categorical columns keep their dtype, using the union of
+        the categories of every frame, instead of falling back to object. With no frames, returns
+        an empty DataFrame with a DatetimeIndex.
+    '''
+    if len(frames) == 0:
+        return DataFrame(index=pd.DatetimeIndex([]))
+
+    data = pd.concat(frames)
+
+    # Categoricals whose categories differ between frames come out as object columns
+    categorical = [col for col, dtype in data.dtypes.items() if dtype == object and
+                   any(col in each.columns and isinstance(each[col].dtype, pd.CategoricalDtype) for each in frames)]
+
+    if len(categorical) == 0:
+        return data
+
+    frames = list(frames)
+    for col in categorical:
+        categories = union_categoricals([each[col] for each in frames if col in each.columns]).categories
+        for i, each in enumerate(frames):
+            if col in each.columns:
+                frames[i] = each.assign(**{col: each[col].cat.set_categories(categories)})
+
+    return pd.concat(frames)
+
+
+def _keys(index):
+    # The timestamps of a DatetimeIndex as int64, so the overlaps are found with plain numpy
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8
+
+    return np.asarray(index)
+
+
+def merge_frames(frames):
+    '''
+        Concatenates time-indexed frames (e.g. one per file), keeping only the first row for each
+        timestamp, like drop_duplicates on the index would. The time range of every frame is used
+        to find the ones that overlap; only the rows inside an overlap are compared against the
+        rows already kept, so frames that do not overlap cost nothing beyond the concatenation.
+        Since files come in time order, only the last few frames kept are ever looked at. The
+        rows to drop are marked frame by frame and dropped from the concatenation in one go.
+    '''
+    frames = list(frames)
+    masks = []
+    spans = []
+    # reach[i] is the latest timestamp of spans[:i + 1], so it never decreases
+    reach = []
+
+    for each in frames:
+        keys = _keys(each.index)
+        keep = None
+
+        if len(keys) == 0:
+            masks.append(keep)
+            continue
+
+        ordered = bool((keys[1:] >= keys[:-1]).all())
+        if not (ordered and (keys[1:] > keys[:-1]).all()):
+            # Rows repeated within the frame itself
+            keep = ~each.index.duplicated()
+            if keep.all():
+                keep = None
+
+        lo, hi = (keys[0], keys[-1]) if ordered else (keys.min(), keys.max())
+
+        if len(reach) > 0 and lo <= reach[-1]:
+            # Timestamps already kept that fall within this frame's range; the frames before the
+            # first one reaching `lo` all end before it
+            seen = []
+            for first, last, k, k_ordered in spans[bisect.bisect_left(reach, lo):]:
+                if first <= hi and last >= lo:
+                    if k_ordered:
+                        seen.append(k[np.searchsorted(k, lo, 'left'):np.searchsorted(k, hi, 'right')])
+                    else:
+                        seen.append(k[(k >= lo) & (k <= hi)])
+
+            if len(seen) > 0:
+                seen = seen[0] if len(seen) == 1 else np.concatenate(seen)
+                # Only the rows up to the latest timestamp kept can repeat one
+                n = np.searchsorted(keys, reach[-1], 'right') if ordered else len(keys)
+                duplicate = np.isin(keys[:n], seen)
+                if not ordered:
+                    duplicate &= keys <= reach[-1]
+                if duplicate.any():
+                    if keep is None:
+                        keep = np.ones(len(keys), dtype=bool)
+                    keep[:n] &= ~duplicate
+
+        masks.append(keep)
+        spans.append((lo, hi, keys if keep is None else keys[keep], ordered))
+        reach.append(hi if len(reach) == 0 else max(reach[-1], hi))
+
+    data = concat(frames)
+
+    if any(keep is not None for keep in masks):
+        data = data[np.concatenate([np.ones(len(each), dtype=bool) if keep is None else keep
+                                    for each, keep in zip(frames, masks)])]
+
+    return data
+
+
+def parse_files(files, parser, processes=1, cache=None, schema=None, prefetch=None):
+    '''
+        Parses each file in `files` with `parser` and returns a list of DataFrames in the same order
+        as `files`. If `processes` is greater than one, the files are parsed in a pool of worker
+        processes; `processes=None` uses one worker per cpu. `parser` must be a module-level function
+        so it can be sent to the workers. If `cache` (a ParseCache or a directory) is set, files that
+        have not changed since they were last parsed are read back from the cache instead. If
+        `schema` (an instrument name) is set, each frame is converted to the compact dtypes
+        registered for that instrument as soon as it is parsed. When the files are parsed one after
+        the other, `prefetch` (a Prefetch, True or a byte budget) reads the next files on threads
+        while the current one is parsed, and `parser` is given the contents of the file (bytes)
+        instead of its name.
+    '''
+    files = list(files)
+    parser = _wrap(parser, cache=cache, schema=schema)
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    # Not worth starting a pool for a single file (or a single worker)
+    if processes <= 1 or len(files) <= 1:
+        return [_parse(parser, each, contents) for each, contents in _iter_contents(files, parser, prefetch)]
+
+    tracer = trace._active
+    if tracer is not None:
+        parser = _Timed(parser)
+
+    pool = multiprocessing.Pool(min(processes, len(files)))
+    try:
+        # map keeps the results in the same order as the input files
+        frames = pool.map(parser, files, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    if tracer is not None:
+        for each, (data, (start, seconds, pid, tid)) in zip(files, frames):
+            tracer.record('parse', start, seconds, file=each, rows=len(data), bytes=_size(each), pid=pid, tid=tid)
+        frames = [data for data, timing in frames]
+
+    return frames
+
+
+def iter_files(files, parser, cache=None, schema=None, prefetch=None):
+    '''
+        Parses the files in `files` one at a time, yielding a (filename, DataFrame) pair for each so
+        only one file needs to be held in memory (plus what `prefetch` reads ahead, see parse_files).
+    '''
+    parser = _wrap(parser, cache=cache, schema=schema)
+
+    for each, contents in _iter_contents(files, parser, prefetch):
+        yield each, _parse(parser, each, contents)
+
+
+def read_files(files, parser, processes=1, cache=None, schema=None, prefetch=None):
+    '''
+        Parses every file in `files` with `parser` and concatenates the results once, so the cost
+        is linear in the total number of rows rather than quadratic in the number of files.
+        Returns an empty DataFrame if there are no files.
+
+        >>>data = read_files(files, _parse_thermo_dat, processes=4)
+    '''
+    frames = parse_files(files, parser, processes=processes, cache=cache, schema=schema, prefetch=prefetch)
+
+    return concat(frames)
@@ -1,16 +1,29 @@
 """
 	Functions used to import and export thermo scientific analyzer data
 """
-__all__ = ['read_thermo_dat','read_thermo_csv','read_thermo_xlsx']
+__all__ = ['read_thermo_dat','read_thermo_csv','read_thermo_xlsx','iter_thermo_dat','read_thermo_multi','FileIndex']
 
 import os
 import re
 import sys
 import warnings
 import glob
+import bisect
+import fnmatch
+import threading
+import time
+import numpy as np
 import pandas as pd
 from pandas import Series, DataFrame
 
+from .ingest import parse_files, iter_files, merge_frames
+from .dat import parse_dat
+from .schema import MODELS, SPECIES, apply_schema
+from .store import as_store
+from .xlsx import read_xlsx
+from .trace import stage
+from .prefetch import as_source
+
 
 def numericalSort(value):
 	numbers = re.compile(r'(\d+)')
@@ -19,151 +32,449 @@ def numericalSort(value):
 	return parts
 
 	
+# Directory modification times within this many seconds of a scan are not trusted, since files
+# added in the same tick (1-2 s on many network shares) would not change them
+RACY_SECONDS = 3
+
+
+class FileIndex():
+    '''
+        Index of the data files in `runDir`. The directory is scanned once and the date in each
+        filename (the MMDDYY after the first space, e.g. "42I 080513 0000.dat") is parsed once,
+        so repeated date-range queries are answered by bisection. The index only re-scans the
+        directory when its modification time changes (or was too close to the last scan to tell
+        files added since apart, see RACY_SECONDS), and only parses the names it has not seen.
+        It never changes the working directory.
+
+        >>> index = FileIndex(runDir)
+        >>> files = index.query('42I', 'dat', start='9-1-2013', end='9-30-2013')
+    '''
+
+    def __init__(self, runDir):
+        self.runDir = runDir
+        self.dates = {}
+        self.mtime = None
+        self.lock = threading.Lock()
+
+        # (instrument, fileType) -> (sorted dates, names in the same order, names without a date)
+        self.queries = {}
+
+    def refresh(self, force=False):
+        '''
+            Picks up files that were added to (or removed from) the directory since the last scan
+        '''
+        with self.lock:
+            mtime = os.stat(self.runDir).st_mtime_ns
+            if mtime == self.mtime and not force:
+                return
+
+            scanned = time.time_ns()
+            names = set(each.name for each in os.scandir(self.runDir) if each.is_file() and not each.name.startswith('.'))
+
+            for name in set(self.dates) - names:
+                del self.dates[name]
+
+            # Parse the dates of all the new names in one go
+            new = sorted(names - set(self.dates))
+            tokens = [name.split(' ')[1] if len(name.split(' ')) > 1 else '' for name in new]
+            dates = pd.to_datetime(Series(tokens, dtype=object), format='%m%d%y', errors='coerce')
+            self.dates.update(zip(new, dates))
+
+            # Like git's racy timestamps: scan again next time until the mtime is old enough to trust
+            self.mtime = mtime if scanned - mtime > RACY_SECONDS * 10**9 else None
+            self.queries = {}
+
+    def _entries(self, instrument, fileType):
+        key = (instrument, fileType)
+        if key not in self.queries:
+            pattern = '*%s*.%s' % (instrument, fileType)
+            names = [name for name in self.dates if fnmatch.fnmatch(name, pattern)]
+
+            dated = sorted((self.dates[name], numericalSort(name), name) for name in names if not pd.isnull(self.dates[name]))
+            undated = sorted((name for name in names if pd.isnull(self.dates[name])), key=numericalSort)
+
+            self.queries[key] = ([each[0] for each in dated], [each[2] for each in dated], undated)
+
+        return self.queries[key]
+
+    def query(self, instrument=None, fileType=None, start=None, end=None):
+        '''
+            Returns the names of the files with `instrument` in their name and extension `fileType`,
+            sorted by the date in their filename. Only files dated between `start` and `end`
+            (inclusive) are returned if either is set; otherwise files without a date in their
+            name are included at the end.
+        '''
+        self.refresh()
+
+        with self.lock:
+            dates, names, undated = self._entries(instrument, fileType)
+
+        if start is None and end is None:
+            return names + undated
+
+        lo = 0 if start is None else bisect.bisect_left(dates, pd.to_datetime(start))
+        hi = len(dates) if end is None else bisect.bisect_right(dates, pd.to_datetime(end))
+
+        return names[lo:hi]
+
+    def count(self, instrument=None, fileType=None):
+        '''
+            Returns the number of files with `instrument` in their name and extension `fileType`
+        '''
+        self.refresh()
+
+        with self.lock:
+            dates, names, undated = self._entries(instrument, fileType)
+
+        return len(names) + len(undated)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(runDir):
+    '''
+        Returns the (shared) FileIndex for `runDir`
+    '''
+    key = os.path.abspath(runDir)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = FileIndex(key)
+
+        return _indexes[key]
+
+	
 def get_files(instrument=None, start=None, end=None, fileType=None, runDir=os.getcwd()):
     
     '''
         Grabs all files in runDir with filename including `instrument` and file extension `fileType`.
         The daterange can be set using `start` and `end`. `fileType` should not have the period included.
+        Returns the filenames relative to runDir, sorted by the date in their name.
     '''
     
-    if os.getcwd != runDir:
-        os.chdir(runDir)
-    
-    try:
-        files = glob.glob('*%s*.%s' % (instrument, fileType))
-        if len(files) == 0:
-            warnings.warn("There were no files found like '%s'" % (instrument))
-    except:
-        sys.exit("No files were found with file name like: %s" % (instrument))
-        
-    # Sort the files by date in reverse order
-    files = sorted(files, key=numericalSort, reverse=False)
+    index = get_index(runDir)
     
-    filesinrange = []
+    if index.count(instrument, fileType) == 0:
+        warnings.warn("There were no files found like '%s'" % (instrument))
     
-    if (start == None and end == None): # if end/start are not defined
-        filesinrange = files
-    elif (start != None and end == None):
-        for each in files:
-            try:
-                if pd.to_datetime(each.split(' ')[1], format='%m%d%y') >= pd.to_datetime(start):
-                    filesinrange.append(each)
-            except:
-                pass
-            
-    elif (start != None and end != None):
-        for each in files:
-            try:
-                filedate = pd.to_datetime(each.split(' ')[1], format='%m%d%y')
-                if filedate >= pd.to_datetime(start) and filedate <= pd.to_datetime(end):
-                    filesinrange.append(each)
-            except:
-                pass
-            
-    return filesinrange
-	
-	
-	
-def read_thermo_dat(model='nox', runDir=os.getcwd(), sample_int='1min', start=None, end=None):
+    return index.query(instrument, fileType, start=start, end=end)
+	
+	
+	
+def _get_instrument(model):
+    '''
+        Returns the thermo scientific model number for `model` (one of nox, sox, or o3)
+    '''
+    if model not in MODELS:
+        sys.exit("The model you defined is not valid or supported yet.")
+
+    return MODELS[model]
+	
+	
+def _resample(data, sample_int, origin='start_day'):
+    '''
+        Resamples the numeric columns of `data` to `sample_int` by taking the mean of each bin
+    '''
+    return data.select_dtypes(include=[np.number]).resample(sample_int, origin=origin).mean()
+	
+	
+def _parse_thermo_dat(filename):
+    '''
+        Parses a single .dat file written by a thermo scientific analyzer
+    '''
+    return parse_dat(filename)
+	
+	
+def _read_table_thermo_dat(filename):
+    '''
+        Parses a single .dat file written by a thermo scientific analyzer with pandas' generic parser
+    '''
+    return pd.read_table(as_source(filename), sep=r'\s+', skiprows=4, header=5, parse_dates=[[1,0]], keep_date_col=True, index_col='Date_Time', on_bad_lines='warn')
+	
+	
+def read_thermo_dat(model='nox', runDir=os.getcwd(), sample_int='1min', start=None, end=None, processes=1, cache=None, engine='fast', compact=False, store=None,
+                    prefetch=True):
     '''
         Reads thermo data from .dat file type.
         model = one of: nox, sox, or o3
+        processes = number of worker processes used to parse the files (None uses one per cpu)
+        cache = ParseCache (or directory for one) used to skip re-parsing files that have not changed
+        engine = 'fast' to use the dedicated .dat parser, or 'pandas' to use pd.read_table
+        compact = convert each file to the compact dtypes registered for the instrument as it is parsed
+        store = DataStore (or directory for one) the raw data is added to, under the instrument name
+        prefetch = read the next files on threads while one is parsed (a Prefetch, True, a byte budget or False);
+            only used when the files are parsed in this process
         returns the number of files read and DataSeries containing all data munged and organized for the user for the 
         Thermo Scientific line of atmospheric gas analyzers
 			
 		>>>filecount, no = read_thermo_dat('o3', runDir=dataDir)
 	'''
 
-    # If the data is in a different directory, change the directory
-    if os.getcwd() != runDir:
-        os.chdir(runDir)
-    
     # Set the model name based on input
-    if model =='nox':
-        instrument = '42I'
-    elif model == 'sox':
-        instrument = '43I'
-    elif model == 'o3':
-        instrument = '49I'
-    else:
-        sys.exit("The model you defined is not valid or supported yet.")
+    instrument = _get_instrument(model)
     
     # grab all files in the directory for a given instrument with the .dat file extension
-    files = get_files(instrument,fileType='dat',start=start, end=end, runDir=runDir)
+    with stage('get_files') as s:
+        files = get_files(instrument,fileType='dat',start=start, end=end, runDir=runDir)
+        s.rows = len(files)
     
-    fileNo = 1
-    data = DataFrame()
+    fileNo = len(files) + 1
     
-    # Concatenate the data from each file together to build one big dataframe
-    for each in files:
-        newData = pd.read_table(each, sep='\s+', skiprows=4, header=5, parse_dates=[[1,0]], keep_date_col=True, index_col='Date_Time', warn_bad_lines=True)
-        data = pd.concat([data, newData])
-        fileNo += 1
+    # Parse every file (in parallel if asked to) and concatenate the data once to build one big dataframe
+    parser = _read_table_thermo_dat if engine == 'pandas' else _parse_thermo_dat
+    frames = parse_files([os.path.join(runDir, each) for each in files], parser, processes=processes, cache=cache,
+                        schema=instrument if compact else None, prefetch=prefetch)
       
-    # Create a duplicate column containing the index to easily drop all duplicate rows from merging files containing
-    #  the same data
-    data['stamp'] = data.index
-    data = data.drop_duplicates(cols='stamp')
+    # Merge the files, dropping the duplicate rows where files containing the same data overlap
+    with stage('merge') as s:
+        data = merge_frames(frames)
+        s.rows = len(data)
+    
+    if store is not None:
+        with stage('store') as s:
+            s.rows = len(as_store(store).write(instrument, data))
     
     # Depending on the model, do some stuff to clean it up
-    if model == 'nox':
+    if model == 'nox' and len(data) > 0:
         data['no2'] = data['nox'] - data['no']
         
     # resample the data based on chosen imput
-    data = data.resample(sample_int)
+    with stage('resample') as s:
+        s.rows = len(data)
+        data = _resample(data, sample_int)
     
     return (fileNo, data)
 	
 	
-def read_thermo_xlsx(filename=None, sheetname='Sheet1', runDir=os.getcwd(), sample_int='1min', skiprows=1):
+def iter_thermo_dat(model='nox', runDir=os.getcwd(), sample_int='1min', start=None, end=None, chunksize=500000, cache=None, compact=False, prefetch=True):
+    '''
+        Reads thermo data from .dat file type one file at a time and yields it as a series of
+        time-ordered, resampled DataFrames so an entire campaign can be processed without holding
+        all of it in memory. Each chunk holds roughly `chunksize` raw rows (more if a single file
+        is bigger than that) before resampling.
+
+        Rows are de-duplicated across file boundaries, and the rows in the last resample bin of
+        each chunk are carried over to the next one so no bin is split between two chunks;
+        concatenating every chunk gives the same result as read_thermo_dat. Rows older than data
+        that has already been yielded are dropped. `compact` converts each file to the compact
+        dtypes registered for the instrument as it is parsed. `prefetch` reads the next files on
+        threads while one is parsed (see read_thermo_dat).
+
+        >>>for chunk in iter_thermo_dat('nox', runDir=dataDir, chunksize=100000):
+        ...    chunk.to_csv(out, header=False)
+    '''
+    instrument = _get_instrument(model)
+    with stage('get_files') as s:
+        files = get_files(instrument, fileType='dat', start=start, end=end, runDir=runDir)
+        s.rows = len(files)
+
+    buffer = []
+    nrows = 0
+    origin = None
+    emitted = None
+
+    def _chunk(buffer, final=False):
+        with stage('merge') as s:
+            data = merge_frames(buffer).sort_index(kind='mergesort')
+            s.rows = len(data)
+
+        if model == 'nox':
+            data['no2'] = data['nox'] - data['no']
+
+        with stage('resample', rows=len(data)):
+            resampled = _resample(data, sample_int, origin=origin)
+        if final or len(resampled) < 2:
+            return resampled, data.iloc[:0], None
+
+        # The last bin may still get rows from the next file, so hold it back
+        edge = resampled.index[-1]
+        return resampled.iloc[:-1], data[data.index >= edge], edge
+
+    for each, newData in iter_files([os.path.join(runDir, each) for each in files], _parse_thermo_dat, cache=cache,
+                                    schema=instrument if compact else None, prefetch=prefetch):
+        if emitted is not None:
+            newData = newData[newData.index >= emitted]
+
+        if len(newData) == 0:
+            continue
+
+        # Resample every chunk on the same grid as the full campaign
+        if origin is None:
+            origin = newData.index.min().normalize()
+
+        buffer.append(newData)
+        nrows += len(newData)
+
+        if nrows >= chunksize:
+            resampled, carry, edge = _chunk(buffer)
+            if edge is None:
+                continue
+
+            emitted = edge
+            buffer = [carry]
+            nrows = len(carry)
+
+            yield resampled
+
+    if len(buffer) > 0:
+        yield _chunk(buffer, final=True)[0]
+	
+	
+def _align(index, data, tolerance):
+    '''
+        Returns the columns of `data` (sorted by time) taken from the row nearest to each timestamp
+        in `index`, or NaN where the nearest row is further than `tolerance` away
+    '''
+    left = index.asi8
+    right = data.index.asi8
+    tol = pd.Timedelta(tolerance).value
+
+    if len(right) == 0:
+        return dict((col, np.full(len(left), np.nan)) for col in data.columns)
+
+    # Candidates are the rows just before and just after each timestamp
+    after = np.minimum(np.searchsorted(right, left), len(right) - 1)
+    before = np.maximum(after - 1, 0)
+    nearest = np.where(np.abs(left - right[before]) <= np.abs(right[after] - left), before, after)
+    missing = np.abs(right[nearest] - left) > tol
+
+    columns = {}
+    for col in data.columns:
+        values = data[col].to_numpy()
+        if values.dtype.kind != 'f':
+            values = values.astype(np.float64)
+
+        values = values[nearest]
+        values[missing] = np.nan
+        columns[col] = values
+
+    return columns
+
+
+def read_thermo_multi(models=['nox', 'sox', 'o3'], runDir=os.getcwd(), sample_int='1min', start=None, end=None, tolerance='5s', processes=1, cache=None, compact=False,
+                      prefetch=True):
+    '''
+        Reads the .dat files of several analyzers and returns one DataFrame with the trace gas
+        columns of all of them, e.g. the nox, so2 and o3 columns diurnal_plot expects.
+        models = the analyzers to read; the first one with any data sets the timestamps of the combined frame
+        tolerance = how far apart the clocks of two analyzers may be for their rows to be matched
+        sample_int = resample interval of the combined frame (None returns the aligned raw rows)
+
+        The files of every analyzer are parsed in a single pool of `processes` workers (or read
+        ahead with `prefetch` when processes=1, see read_thermo_dat). The other
+        analyzers are then aligned to the first with a sorted as-of join to the nearest row within
+        `tolerance`, filling each column of the combined frame once instead of building outer
+        joins. Rows of the first analyzer without a match get NaN, as do all the columns of an
+        analyzer without files in the range.
+
+        >>>data = read_thermo_multi(['nox', 'sox', 'o3'], runDir=dataDir, tolerance='10s')
+        >>>diurnal_plot(data)
+    '''
+    instruments = [_get_instrument(model) for model in models]
+    with stage('get_files') as s:
+        files = [get_files(instrument, fileType='dat', start=start, end=end, runDir=runDir) for instrument in instruments]
+        s.rows = sum(len(names) for names in files)
+
+    paths = [os.path.join(runDir, each) for names in files for each in names]
+    frames = parse_files(paths, _parse_thermo_dat, processes=processes, cache=cache, prefetch=prefetch)
+
+    merged = []
+    for model, instrument, names in zip(models, instruments, files):
+        with stage('merge') as s:
+            data = merge_frames(frames[:len(names)]).sort_index(kind='mergesort')
+            s.rows = len(data)
+        frames = frames[len(names):]
+
+        if len(data) == 0:
+            # No files in the range; its columns are all NaN
+            data = DataFrame(columns=SPECIES[instrument], index=pd.DatetimeIndex([]), dtype=np.float64)
+
+        # Only keep the trace gas columns
+        data = data[[col for col in SPECIES[instrument] if col in data.columns]]
+        if model == 'nox':
+            data = data.assign(no2=data['nox'] - data['no'])
+        if compact:
+            data = apply_schema(data, instrument)
+        merged.append(data)
+
+    # The first analyzer with any data sets the timestamps
+    base = next((i for i, data in enumerate(merged) if len(data) > 0), 0)
+    index = merged[base].index
+
+    columns = {}
+    for i, data in enumerate(merged):
+        if i == base:
+            columns.update((col, data[col].to_numpy()) for col in data.columns)
+        else:
+            with stage('align', rows=len(data)):
+                columns.update(_align(index, data, tolerance))
+
+    data = DataFrame(columns, index=index, columns=list(columns))
+
+    if sample_int is None:
+        return data
+
+    with stage('resample', rows=len(data)):
+        return _resample(data, sample_int)
+	
+	
+def read_thermo_xlsx(filename=None, sheetname='Sheet1', runDir=os.getcwd(), sample_int='1min', skiprows=1, store=None, key=None,
+                     columns=None, start=None, end=None, sidecar=True):
     '''
         Reads thermo data from .xlsx file type.
         returns DataFrame containing all data munged and organized for the user for the 
             Thermo Scientific line of atmospheric gas analyzers
         This assumes all necessary data is in one sheet within one workbook.
+        If `store` (a DataStore or directory for one) is set, the raw data is added to it under
+            `key` (the name of the workbook by default).
+        The workbook is streamed row by row and only the `columns` (all if None) and the rows
+            between `start` and `end` are kept. Unless `sidecar` is False, a binary copy of the
+            sheet is kept next to the workbook (or in the directory `sidecar`) and read instead
+            while the workbook is unchanged (see read_xlsx).
     '''
     # >>>test = read_thermo_xlsx("SLAQRS.xlsx",runDir="C:/Users/David/Dropbox/SLAQRS/")
+    # >>>nox = read_thermo_xlsx("SLAQRS.xlsx",runDir="C:/Users/David/Dropbox/SLAQRS/",columns=['nox'],start='8-1-2013',end='8-7-2013')
 	
-    # If the data is in a different directory, change the directory
-    if os.getcwd() != runDir:
-        os.chdir(runDir)
-        
-    
-    data = pd.read_excel(filename,sheetname, skiprows=skiprows, index_col=0)
+    data = read_xlsx(os.path.join(runDir, filename), sheetname, skiprows=skiprows, columns=columns, start=start, end=end,
+                     sidecar=sidecar)
       
-    # Create a duplicate column containing the index to easily drop all duplicate rows from merging files containing
-    #  the same data
-    data['stamp'] = data.index
-    data = data.drop_duplicates(cols='stamp')
+    # Drop all duplicate rows from merging files containing the same data
+    data = data[~data.index.duplicated()]
+    
+    if store is not None:
+        as_store(store).write(key or os.path.splitext(os.path.basename(filename))[0], data)
      
     # resample the data based on chosen imput
-    data = data.resample(sample_int)
+    with stage('resample', rows=len(data)):
+        data = _resample(data, sample_int)
     
     return data
 	
 	
-def read_thermo_csv(filename=None, runDir=os.getcwd(), sample_int='1min'):
+def read_thermo_csv(filename=None, runDir=os.getcwd(), sample_int='1min', store=None, key=None):
     '''
         Reads thermo data from .csv file type.
         returns DataFrame containing all data munged and organized for the user for the 
             Thermo Scientific line of atmospheric gas analyzers
         This assumes all necessary data is in one sheet within one workbook.
+        If `store` (a DataStore or directory for one) is set, the raw data is added to it under
+            `key` (the name of the file by default).
     '''
     # >>>test = read_thermo_csv("SLAQRS.csv",runDir="C:/Users/David/Dropbox/SLAQRS/")
 	
-    # If the data is in a different directory, change the directory
-    if os.getcwd() != runDir:
-        os.chdir(runDir)
-        
-    
-    data = pd.read_csv(filename, header=0, index_col=0, parse_dates=True, error_bad_lines=False)
+    with stage('parse', file=filename) as s:
+        data = pd.read_csv(os.path.join(runDir, filename), header=0, index_col=0, parse_dates=True, on_bad_lines='skip')
+        s.rows = len(data)
       
-    # Create a duplicate column containing the index to easily drop all duplicate rows from merging files containing
-    #  the same data
-    data['stamp'] = data.index
-    data = data.drop_duplicates(cols='stamp')
+    # Drop all duplicate rows from merging files containing the same data
+    data = data[~data.index.duplicated()]
+    
+    if store is not None:
+        as_store(store).write(key or os.path.splitext(os.path.basename(filename))[0], data)
      
     # resample the data based on chosen imput
-    data = data.resample(sample_int)
+    with stage('resample', rows=len(data)):
+        data = _resample(data, sample_int)
     
     return data
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+	Threaded read-ahead of data files, so slow (network or synced) directories are read while
+	the files before them are being parsed
+"""
+__all__ = ['Prefetch']
+
+import io
+import os
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from . import trace
+
+# Defaults used when prefetching is simply switched on
+PREFETCH_THREADS = 4
+PREFETCH_BYTES = 64 * 2**20
+
+
+class _Contents(bytes):
+    '''
+        The bytes of a file along with the os.stat_result of the file taken just before they were
+        read, so a ParseCache can key them by the file as it was read rather than as it is now
+    '''
+    stat = None
+
+
+def _read(filename):
+    with trace.stage('read', file=filename) as s:
+        st = os.stat(filename)
+        with open(filename, 'rb') as f:
+            contents = _Contents(f.read())
+        contents.stat = st
+        s.bytes = len(contents)
+
+    return contents
+
+
+def _size(filename):
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        # Let the read itself raise the error, in order
+        return 0
+
+
+class Prefetch():
+    '''
+        Reads the raw bytes of upcoming files on a pool of `threads` threads while the current one
+        is being parsed. No more than `budget` bytes are read ahead and not yet parsed at a time
+        (a single file bigger than that is still read, on its own), so a huge directory can not
+        exhaust memory. Readers take `prefetch=` a Prefetch, True for the defaults, a byte budget,
+        or None/False to read each file only when it is parsed.
+
+        >>> files, nox = read_thermo_dat('nox', runDir="C:/Users/David/Dropbox/SLAQRS/", prefetch=Prefetch(threads=8, budget=256 * 2**20))
+        >>> for filename, contents in Prefetch().iter(paths):
+        ...    data = parse_dat(contents)
+    '''
+
+    def __init__(self, threads=PREFETCH_THREADS, budget=PREFETCH_BYTES):
+        self.threads = max(int(threads), 1)
+        self.budget = int(budget)
+
+    def iter(self, files, skip=None):
+        '''
+            Yields a (filename, contents) pair for each of `files` in order. Files for which
+            `skip(filename)` is True (e.g. ones a ParseCache already holds) are not read and
+            come with None for their contents.
+        '''
+        files = list(files)
+        queue = collections.deque()
+        held = 0
+        position = 0
+
+        executor = ThreadPoolExecutor(self.threads)
+        try:
+            while position < len(files) or len(queue) > 0:
+                # Read ahead as far as the budget allows, but always at least the next file
+                while position < len(files):
+                    filename = files[position]
+                    if skip is not None and skip(filename):
+                        queue.append((filename, 0, None))
+                    else:
+                        size = _size(filename)
+                        if held > 0 and held + size > self.budget:
+                            break
+                        queue.append((filename, size, executor.submit(_read, filename)))
+                        held += size
+                    position += 1
+
+                filename, size, future = queue.popleft()
+                yield filename, None if future is None else future.result()
+
+                # The caller is done with this file once it asks for the next one
+                held -= size
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def as_prefetch(prefetch):
+    '''
+        Allows readers to accept a Prefetch, True for the defaults, a byte budget, or None/False
+    '''
+    if prefetch is None or prefetch is False:
+        return None
+    if prefetch is True:
+        return Prefetch()
+    if isinstance(prefetch, Prefetch):
+        return prefetch
+
+    return Prefetch(budget=prefetch)
+
+
+def as_source(filename):
+    '''
+        Lets pandas-based parsers take the contents of a file (bytes) as well as its name
+    '''
+    if isinstance(filename, bytes):
+        return io.BytesIO(filename)
+
+    return filename
@@ -0,0 +1,274 @@
+"""
+	Rule-based quality control flags for the data of each instrument
+"""
+__all__ = ['QC_FLAGS', 'register_rules', 'get_rules', 'qc_flags', 'iter_qc', 'qc_mask', 'qc_summary']
+
+import fnmatch
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+from .schema import SPECIES
+
+# Bit set in the flag column by each kind of check
+QC_FLAGS = {
+    'range': 1,
+    'spike': 2,
+    'step': 4,
+    'stuck': 8,
+    'diagnostic': 16,
+}
+
+_rules = {}
+
+
+def register_rules(instrument, rules):
+    '''
+        Registers the QC rules of `instrument`. `rules` maps column names or patterns
+        (case-insensitive, e.g. 'TC*') to a dict of checks; every pattern that matches a column
+        applies. The checks are:
+            range = (lo, hi): values not strictly between lo and hi (None for no limit)
+            spike = (window, threshold): values more than threshold away from the median of the
+                centred window of `window` samples
+            step = threshold: values more than threshold away from the previous value
+            stuck = n: runs of at least n identical values
+            diagnostic = (lo, hi): like range, for instrument diagnostics (flows, temperatures, ...)
+        Replaces any rules registered before.
+
+        >>> register_rules('49I', {'o3': {'range': (-5, 500), 'spike': (31, 50)}, 'flow*': {'diagnostic': (0.5, 1.2)}})
+    '''
+    _rules[instrument] = dict((pattern.lower(), dict(checks)) for pattern, checks in rules.items())
+
+
+def get_rules(instrument):
+    '''
+        Returns the QC rules registered for `instrument` (None if there are none)
+    '''
+    return _rules.get(instrument)
+
+
+def _outside(values, limits):
+    lo, hi = limits
+    bad = np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        if lo is not None:
+            bad |= values <= lo
+        if hi is not None:
+            bad |= values >= hi
+
+    return bad
+
+
+def _spike(series, window, threshold):
+    median = series.rolling(window, center=True, min_periods=1).median().values
+    with np.errstate(invalid='ignore'):
+        return np.abs(series.values - median) > threshold
+
+
+def _step(values, threshold):
+    bad = np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        bad[1:] = np.abs(np.diff(values)) > threshold
+
+    return bad
+
+
+def _stuck(values, n):
+    '''
+        Marks the values in runs of at least `n` identical (not NaN) values
+    '''
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+
+    change = np.ones(len(values), dtype=bool)
+    change[1:] = values[1:] != values[:-1]
+    starts = np.flatnonzero(change)
+    lengths = np.diff(np.append(starts, len(values)))
+
+    return (np.repeat(lengths, lengths) >= n) & ~np.isnan(values)
+
+
+def _checks(columns, rules):
+    '''
+        Returns the checks that apply to each column, in column order
+    '''
+    matched = []
+    for col in columns:
+        name = str(col).lower()
+        checks = [each for pattern, each in rules.items() if fnmatch.fnmatchcase(name, pattern)]
+        if len(checks) > 0:
+            matched.append((col, checks))
+
+    return matched
+
+
+def _column_flags(series, checks):
+    values = series.values
+    if values.dtype.kind != 'f':
+        values = values.astype(np.float64)
+    flags = np.zeros(len(values), dtype=np.uint8)
+
+    for each in checks:
+        if 'range' in each:
+            flags[_outside(values, each['range'])] |= QC_FLAGS['range']
+        if 'diagnostic' in each:
+            flags[_outside(values, each['diagnostic'])] |= QC_FLAGS['diagnostic']
+        if 'spike' in each:
+            window, threshold = each['spike']
+            flags[_spike(series, window, threshold)] |= QC_FLAGS['spike']
+        if 'step' in each:
+            flags[_step(values, each['step'])] |= QC_FLAGS['step']
+        if 'stuck' in each:
+            flags[_stuck(values, each['stuck'])] |= QC_FLAGS['stuck']
+
+    return flags
+
+
+def _resolve(instrument, rules):
+    if rules is None:
+        rules = get_rules(instrument)
+        if rules is None:
+            raise ValueError("There are no QC rules registered for %s" % instrument)
+        return rules
+
+    return dict((pattern.lower(), dict(checks)) for pattern, checks in rules.items())
+
+
+def qc_flags(data, instrument=None, rules=None, by_column=False):
+    '''
+        Checks the numeric columns of `data` against the rules registered for `instrument` (or
+        `rules`, laid out as for register_rules) and returns a uint8 Series named 'qc' with, for
+        every row, the QC_FLAGS bits of the checks any column failed. With `by_column` a uint8
+        DataFrame holding the flags of each checked column is returned instead. `data` itself is
+        neither copied nor changed; NaN values are never flagged.
+
+        Every check is a single vectorized pass over a column (the spike check a rolling median),
+        so years of 1 s data can be flagged at once; see iter_qc for data read in chunks.
+
+        >>> files, nox = read_thermo_dat('nox', runDir=dataDir, sample_int='1s')
+        >>> nox['qc'] = qc_flags(nox, '42I')
+        >>> clean = nox[nox['qc'] == 0]
+        >>> qc_summary(nox['qc'])
+    '''
+    rules = _resolve(instrument, rules)
+    numeric = [col for col in data.columns if pd.api.types.is_numeric_dtype(data[col])]
+
+    flags = DataFrame(index=data.index)
+    for col, checks in _checks(numeric, rules):
+        flags[col] = _column_flags(data[col], checks)
+
+    if by_column:
+        return flags
+
+    combined = np.zeros(len(data), dtype=np.uint8)
+    for col in flags.columns:
+        combined |= flags[col].values
+
+    return Series(combined, index=data.index, name='qc')
+
+
+def _context(rules):
+    '''
+        Number of samples on either side of a row that its checks look at
+    '''
+    context = 1
+    for checks in rules.values():
+        if 'spike' in checks:
+            context = max(context, int(checks['spike'][0]))
+        if 'stuck' in checks:
+            context = max(context, int(checks['stuck']))
+
+    return context
+
+
+def iter_qc(chunks, instrument=None, rules=None, by_column=False):
+    '''
+        Flags time-ordered chunks of data (e.g. from iter_thermo_dat) as qc_flags would flag them
+        all at once, yielding a (data, flags) pair for each. The last few rows of a chunk are only
+        yielded with the next one, once the rows after them are known, so every rolling check sees
+        the same neighbours it would in one pass. Windows are numbers of samples.
+
+        >>> for data, flags in iter_qc(iter_thermo_dat('o3', runDir=dataDir, sample_int='1s'), '49I'):
+        ...    data[flags == 0].to_csv(out, header=False)
+    '''
+    rules = _resolve(instrument, rules)
+    context = _context(rules)
+
+    carry = None
+    held = 0
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+
+        # The carried rows are `held` rows already yielded (only used as context) and the rest waiting
+        data = chunk if carry is None else pd.concat([carry, chunk])
+        flags = qc_flags(data, rules=rules, by_column=by_column)
+
+        ready = max(len(data) - context, held)
+        if ready > held:
+            yield data.iloc[held:ready], flags.iloc[held:ready]
+
+        keep = max(ready - context, 0)
+        carry = data.iloc[keep:]
+        held = ready - keep
+
+    if carry is not None and len(carry) > held:
+        flags = qc_flags(carry, rules=rules, by_column=by_column)
+        yield carry.iloc[held:], flags.iloc[held:]
+
+
+def qc_mask(flags, *names):
+    '''
+        Returns a boolean mask of the rows flagged by any of the checks `names` (any check if none
+        are given), e.g. qc_mask(nox['qc'], 'spike', 'stuck')
+    '''
+    bits = 0
+    for name in names or QC_FLAGS:
+        bits |= QC_FLAGS[name]
+
+    return (flags & bits) > 0
+
+
+def qc_summary(flags):
+    '''
+        Returns the number of rows flagged by each check. For flags by column, a DataFrame with
+        one row per column.
+    '''
+    if isinstance(flags, DataFrame):
+        return DataFrame(dict((name, ((flags & bit) > 0).sum()) for name, bit in QC_FLAGS.items()), columns=list(QC_FLAGS))
+
+    return Series(dict((name, int(((flags & bit) > 0).sum())) for name, bit in QC_FLAGS.items()), name='rows')
+
+
+# Trace gas concentrations, in ppb
+for _instrument, _species in SPECIES.items():
+    register_rules(_instrument, dict((sp, {'range': (-5, 10000), 'spike': (61, 100), 'stuck': 60}) for sp in _species))
+
+# Out of spec values of the instrument diagnostics
+get_rules('42I').update({
+        'smplf': {'diagnostic': (0.35, 1.0)},
+        'ozonf': {'diagnostic': (0.03, 0.1)},
+        'pmtt': {'diagnostic': (-6, 0)},
+        'rctt': {'diagnostic': (45, 55)},
+        'convt': {'diagnostic': (300, 350)},
+        'intt': {'diagnostic': (15, 45)},
+        'pres': {'diagnostic': (400, 1000)},
+    })
+get_rules('43I').update({
+        'smplfl': {'diagnostic': (0.35, 0.75)},
+        'rctt': {'diagnostic': (40, 55)},
+        'intt': {'diagnostic': (15, 45)},
+        'pres': {'diagnostic': (400, 1000)},
+    })
+get_rules('49I').update({
+        'flowa': {'diagnostic': (0.4, 1.4)},
+        'flowb': {'diagnostic': (0.4, 1.4)},
+        'bncht': {'diagnostic': (15, 50)},
+        'lmpt': {'diagnostic': (50, 56)},
+        'cellai': {'diagnostic': (45000, 150000)},
+        'cellbi': {'diagnostic': (45000, 150000)},
+        'pres': {'diagnostic': (400, 1000)},
+    })
+
+# Thermocouples of the VAPS; readings at or below zero are not real
+register_rules('Vaps', {'tc*': {'range': (0, None)}})
@@ -0,0 +1,161 @@
+"""
+	Render the daily QA figures of a campaign to image files without a display
+"""
+__all__ = ['render_report']
+
+import os
+import warnings
+import multiprocessing
+import pandas as pd
+from pandas import Series, DataFrame
+
+from .io import read_thermo_dat, get_files, _get_instrument
+from .schema import SPECIES
+
+# Plot kinds render_report knows how to draw
+KINDS = ['debug', 'diurnal', 'trap']
+
+
+def _load_day(model, runDir, day, sample_int, cache):
+    '''
+        Returns the data of `model` for `day`, or None if there is not any. The files of the day
+        before are read too since they may run past midnight.
+    '''
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        files = get_files(_get_instrument(model), fileType='dat', start=day - pd.Timedelta('1D'), end=day, runDir=runDir)
+        if len(files) == 0:
+            return None
+
+        fileNo, data = read_thermo_dat(model, runDir, sample_int=sample_int, start=day - pd.Timedelta('1D'), end=day,
+                                       cache=cache)
+
+    data = data.loc[day:day + pd.Timedelta('1D') - pd.Timedelta('1ns')]
+
+    return data if len(data) > 0 else None
+
+
+def _save(fig, outDir, name, formats):
+    import matplotlib.pyplot as plt
+
+    paths = []
+    for fmt in formats:
+        path = os.path.join(outDir, '%s.%s' % (name, fmt))
+        fig.savefig(path, format=fmt)
+        paths.append(path)
+
+    plt.close(fig)
+
+    return paths
+
+
+def _render_day(task):
+    '''
+        Renders every figure of one day. May run in a worker process, so it only takes plain values.
+    '''
+    import matplotlib.pyplot as plt
+
+    from .visualize import ThermoPlot, diurnal_plot
+    from ..vaps.debug import VAPS_Debug
+
+    day, kinds, models, runDir, vapsDir, outDir, formats, sample_int, cache, trap_args = task
+    label = day.strftime('%Y-%m-%d')
+
+    # Parse each analyzer once and share it between all the plots of the day
+    data = {}
+    for model in models:
+        data[model] = _load_day(model, runDir, day, sample_int, cache)
+
+    paths = []
+    if 'debug' in kinds:
+        for model in models:
+            if data[model] is None:
+                warnings.warn("There is no %s data for %s; its debug plot is skipped" % (model, label))
+                continue
+
+            try:
+                fig, axes = ThermoPlot(data[model]).debug_plot({'show': False})
+                paths += _save(fig, outDir, '%s_debug_%s' % (label, _get_instrument(model)), formats)
+            except Exception as e:
+                plt.close('all')
+                warnings.warn("Could not render the %s debug plot for %s: %s" % (model, label, e))
+
+    if 'diurnal' in kinds:
+        frames = [data[model][[col for col in SPECIES[_get_instrument(model)] if col in data[model].columns]]
+                  for model in models if data[model] is not None]
+
+        try:
+            fig, axes = diurnal_plot(pd.concat(frames, axis=1), show=False, title="Diurnal Profile of Trace Gases: %s" % label)
+            paths += _save(fig, outDir, '%s_diurnal' % label, formats)
+        except Exception as e:
+            plt.close('all')
+            warnings.warn("Could not render the diurnal plot for %s: %s" % (label, e))
+
+    if 'trap' in kinds:
+        try:
+            vaps = VAPS_Debug(vapsDir, start=day, end=day, cache=cache)
+            fig, ax = vaps.plot_trap(trap_args, show=False)
+            paths += _save(fig, outDir, '%s_trap' % label, formats)
+        except Exception as e:
+            plt.close('all')
+            warnings.warn("Could not render the trap plot for %s: %s" % (label, e))
+
+    return paths
+
+
+def _render_worker(task):
+    # Workers never display anything, so they can switch to Agg for good
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+    return _render_day(task)
+
+
+def render_report(runDir, outDir, start, end, kinds=['debug', 'diurnal'], models=['nox', 'sox', 'o3'], formats=['png'],
+                  processes=None, sample_int='1min', cache=None, vapsDir=None, trap_args={}):
+    '''
+        Renders the QA figures of every day between `start` and `end` to `outDir` (as
+        "<date>_<kind>[_<instrument>].<format>") without displaying anything. Worker processes
+        draw on the Agg backend; when the days are drawn in this process the current backend is
+        left alone (with interactive mode off while drawing) and every figure is closed once saved.
+        kinds = any of 'debug' (ThermoPlot.debug_plot of each model), 'diurnal' (diurnal_plot of
+            all the models) and 'trap' (VAPS_Debug.plot_trap of the files in vapsDir with trap_args)
+        formats = image formats to save each figure as, e.g. ['png', 'pdf']
+        processes = number of worker processes, one day per task (None uses one per cpu)
+
+        The data of each analyzer is parsed once per day and shared between its plots. Figures
+        that can not be drawn (e.g. a day without data) are skipped with a warning. Returns the
+        paths of the files written.
+
+        >>>paths = render_report(dataDir, "C:/Users/David/Desktop/QA", '8-1-2013', '8-31-2013', formats=['png', 'pdf'])
+    '''
+    for kind in kinds:
+        if kind not in KINDS:
+            raise ValueError("Unknown plot kind %s; options are %s" % (kind, KINDS))
+
+    if not os.path.isdir(outDir):
+        os.makedirs(outDir)
+
+    if vapsDir is None:
+        vapsDir = runDir
+
+    days = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D')
+    tasks = [(day, list(kinds), list(models), runDir, vapsDir, outDir, list(formats), sample_int, cache, trap_args)
+             for day in days]
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    if processes <= 1 or len(tasks) <= 1:
+        import matplotlib.pyplot as plt
+        with plt.ioff():
+            results = [_render_day(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        try:
+            results = pool.map(_render_worker, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+    return [path for paths in results for path in paths]
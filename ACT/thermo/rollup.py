@@ -0,0 +1,202 @@
+"""
+	Pre-aggregated rollups of time series data at several standard intervals
+"""
+__all__ = ['Rollup']
+
+import os
+import re
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+from pandas.tseries.frequencies import to_offset
+
+from .cache import write_frame, read_frame
+
+LEVELS = ['1min', '1h', '1D']
+STATS = ['sum', 'count', 'min', 'max']
+
+PARTITION = re.compile(r'^(\d{4}-\d{2})\.npz$')
+
+
+def _nanos(freq):
+    offset = to_offset(freq)
+    try:
+        return offset.nanos
+    except ValueError:
+        raise ValueError("Only fixed frequencies can be rolled up, not %s" % freq)
+
+
+def _aggregate(data, level):
+    '''
+        Returns the sum, count, min and max of every column of `data` for each `level` bin, with
+        columns named '<column>|<stat>'. Bins without any data are left out.
+    '''
+    resampled = data.resample(level, origin='epoch')
+    stats = {'sum': resampled.sum(), 'count': resampled.count(), 'min': resampled.min(), 'max': resampled.max()}
+
+    columns = {}
+    for col in data.columns:
+        for stat in STATS:
+            columns['%s|%s' % (col, stat)] = stats[stat][col]
+
+    agg = DataFrame(columns, columns=list(columns))
+    return agg[stats['count'].sum(axis=1).values > 0]
+
+
+def _combine(frames):
+    '''
+        Combines the aggregates of bins that appear in more than one of `frames`
+    '''
+    data = pd.concat(frames)
+    if data.index.is_unique:
+        return data.sort_index()
+
+    grouped = data.groupby(level=0)
+    columns = {}
+    for col in data.columns:
+        stat = col.rsplit('|', 1)[1]
+        columns[col] = getattr(grouped[col], 'sum' if stat in ('sum', 'count') else stat)()
+
+    return DataFrame(columns, columns=list(data.columns))
+
+
+class Rollup():
+    '''
+        Keeps the sum, count, min and max of every numeric column at several standard intervals
+        (`levels`, 1min, 1h and 1D by default), stored under `path` with one file per level and
+        month (or in memory if `path` is None). update() folds new raw data into every level, and
+        resample() answers a request from the coarsest level that divides the requested interval,
+        without going back to the raw data.
+
+        Bins are aligned to the epoch, which is the same as read_thermo_dat's bins for any interval
+        that divides a day. update() must only be given rows that have not been added before.
+
+        >>> rollup = Rollup("C:/Users/David/Dropbox/SLAQRS/rollup/42I")
+        >>> rollup.update(raw)
+        >>> hourly = rollup.resample('1h', start='9-1-2013', end='9-30-2013', columns=['nox'])
+    '''
+
+    def __init__(self, path=None, levels=LEVELS):
+        self.path = path
+        self.levels = sorted(levels, key=_nanos)
+        self.memory = dict((level, {}) for level in self.levels)
+
+        if path is not None and not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _months(self, level):
+        if self.path is None:
+            return sorted(self.memory[level])
+
+        path = os.path.join(self.path, level)
+        if not os.path.isdir(path):
+            return []
+
+        return sorted(pd.Timestamp(PARTITION.match(each).group(1)) for each in os.listdir(path) if PARTITION.match(each))
+
+    def _filename(self, level, month):
+        return os.path.join(self.path, level, '%s.npz' % month.strftime('%Y-%m'))
+
+    def _load(self, level, month, columns=None):
+        if self.path is None:
+            data = self.memory[level].get(month)
+            if data is not None and columns is not None:
+                data = data[[c for c in columns if c in data.columns]]
+            return data
+
+        filename = self._filename(level, month)
+        if not os.path.exists(filename):
+            return None
+
+        return read_frame(filename, columns=columns)
+
+    def _save(self, level, month, data):
+        if self.path is None:
+            self.memory[level][month] = data
+            return
+
+        if not os.path.isdir(os.path.join(self.path, level)):
+            os.makedirs(os.path.join(self.path, level))
+
+        write_frame(self._filename(level, month), data)
+
+    def update(self, data):
+        '''
+            Adds the numeric columns of `data` (new raw rows) to every level. Only the months that
+            the new rows fall in are rewritten.
+        '''
+        data = data.select_dtypes(include=[np.number])
+        if len(data) == 0:
+            return self
+
+        for level in self.levels:
+            agg = _aggregate(data, level)
+            months = agg.index.to_period('M').to_timestamp()
+
+            for month in months.unique():
+                part = agg[months == month]
+                existing = self._load(level, month)
+                if existing is not None:
+                    part = _combine([existing, part])
+
+                self._save(level, month, part)
+
+        return self
+
+    def level_for(self, sample_int):
+        '''
+            Returns the coarsest level that divides `sample_int` evenly (None if there is not one)
+        '''
+        nanos = _nanos(sample_int)
+        levels = [level for level in self.levels if nanos % _nanos(level) == 0]
+
+        return levels[-1] if len(levels) > 0 else None
+
+    def resample(self, sample_int, how='mean', start=None, end=None, columns=None):
+        '''
+            Returns the data resampled to `sample_int` and aggregated with `how` (mean, sum, count,
+            min or max) between `start` and `end`, computed from the coarsest stored level that
+            divides `sample_int`. `start` and `end` select whole bins of that level. Raises a
+            ValueError if no level divides `sample_int`.
+        '''
+        level = self.level_for(sample_int)
+        if level is None:
+            raise ValueError("None of the rollup levels %s divide %s" % (self.levels, sample_int))
+
+        months = self._months(level)
+        if start is not None:
+            months = [m for m in months if m >= pd.Timestamp(start).normalize().replace(day=1)]
+        if end is not None:
+            months = [m for m in months if m <= pd.Timestamp(end)]
+
+        names = None
+        if columns is not None:
+            names = ['%s|%s' % (col, stat) for col in columns for stat in STATS]
+
+        frames = [self._load(level, month, columns=names) for month in months]
+        frames = [each for each in frames if each is not None]
+        if len(frames) == 0:
+            return DataFrame(columns=columns, index=pd.DatetimeIndex([]))
+
+        base = pd.concat(frames).sort_index().loc[start:end]
+        if columns is None:
+            columns = []
+            for col in base.columns:
+                if col.rsplit('|', 1)[0] not in columns:
+                    columns.append(col.rsplit('|', 1)[0])
+
+        def _stat(col, stat):
+            resampled = base['%s|%s' % (col, stat)].resample(sample_int, origin='epoch')
+            return resampled.sum() if stat in ('sum', 'count') else getattr(resampled, stat)()
+
+        result = {}
+        for col in columns:
+            if how == 'mean':
+                count = _stat(col, 'count')
+                result[col] = _stat(col, 'sum') / count.where(count > 0)
+            elif how in STATS:
+                result[col] = _stat(col, how)
+            else:
+                raise ValueError("Rollups can not be aggregated with %s" % how)
+
+        return DataFrame(result, columns=columns)
@@ -0,0 +1,83 @@
+"""
+	Registry of the compact dtypes used to hold the data of each instrument in memory
+"""
+__all__ = ['register_schema', 'get_schema', 'apply_schema']
+
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+# Thermo scientific model number for each model name used by the readers
+MODELS = {
+    'nox': '42I',
+    'sox': '43I',
+    'o3': '49I',
+}
+
+# Trace gas concentration columns of each instrument
+SPECIES = {
+    '42I': ['no', 'no2', 'nox', 'hino', 'hino2', 'hinox'],
+    '43I': ['so2', 'hiso2'],
+    '49I': ['o3', 'hio3'],
+}
+
+# Columns that only duplicate the timestamp index are dropped
+DROP = 'drop'
+
+_schemas = {}
+
+
+def register_schema(instrument, columns={}, default='float32'):
+    '''
+        Registers the dtypes used for the columns of `instrument`. `columns` maps column names
+        (case-insensitive) to a dtype, or to 'drop' to leave that column out; any other column
+        is converted to `default` (None leaves it as parsed).
+
+        >>> register_schema('Vaps', {'Bank 0 Relay States': 'uint8'})
+    '''
+    _schemas[instrument] = {
+            'columns': dict((col.lower(), dtype) for col, dtype in columns.items()),
+            'default': default,
+        }
+
+
+def get_schema(instrument):
+    '''
+        Returns the schema registered for `instrument` (None if there is not one)
+    '''
+    return _schemas.get(instrument)
+
+
+def apply_schema(data, instrument):
+    '''
+        Returns `data` with its columns converted to the compact dtypes registered for `instrument`.
+        Numeric columns are only downcast to the default dtype; text columns are left alone.
+    '''
+    schema = get_schema(instrument)
+    if schema is None:
+        raise ValueError("There is no schema registered for %s" % instrument)
+
+    columns = {}
+    for col in data.columns:
+        dtype = schema['columns'].get(str(col).lower())
+
+        if dtype is None:
+            if schema['default'] is None or not pd.api.types.is_numeric_dtype(data[col]):
+                columns[col] = data[col]
+                continue
+            dtype = schema['default']
+
+        if dtype == DROP:
+            continue
+
+        columns[col] = data[col].astype(dtype)
+
+    return DataFrame(columns, index=data.index, columns=list(columns))
+
+
+for _instrument, _species in SPECIES.items():
+    _columns = dict((sp, 'float32') for sp in _species)
+    _columns.update({'time': DROP, 'date': DROP, 'flags': 'category'})
+    register_schema(_instrument, _columns)
+
+register_schema('Vaps')
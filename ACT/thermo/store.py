@@ -0,0 +1,165 @@
+"""
+	Local on-disk store of ingested data, partitioned by instrument and day
+"""
+__all__ = ['DataStore']
+
+import os
+import re
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+from .cache import write_frame, read_frame
+from .ingest import merge_frames, concat
+from .rollup import Rollup, LEVELS
+
+PARTITION = re.compile(r'^(\d{4}-\d{2}-\d{2})\.npz$')
+
+
+class DataStore():
+    '''
+        Stores time-indexed data under `root` with one directory per instrument and one .npz file
+        per day, each holding one array per column. read_range only opens the partitions of the
+        days asked for and only reads the columns asked for.
+
+        >>> store = DataStore("C:/Users/David/Dropbox/SLAQRS/store")
+        >>> files, nox = read_thermo_dat('nox', runDir, store=store)
+        >>> data = store.read_range('42I', '9-1-2013', '9-7-2013', columns=['no', 'nox'])
+
+        With `rollups` on, every write also updates a Rollup of each instrument (kept in its
+        'rollup' directory) so resample() can answer coarse requests without reading raw rows.
+
+        >>> store = DataStore("C:/Users/David/Dropbox/SLAQRS/store", rollups=True)
+        >>> hourly = store.resample('42I', '1h', start='1-1-2013', end='12-31-2013')
+    '''
+
+    def __init__(self, root, rollups=False, levels=LEVELS):
+        self.root = os.path.abspath(root)
+        self.rollups = rollups
+        self.levels = levels
+
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root)
+
+    def _path(self, instrument, day=None):
+        path = os.path.join(self.root, instrument)
+        if day is None:
+            return path
+
+        return os.path.join(path, '%s.npz' % day.strftime('%Y-%m-%d'))
+
+    def instruments(self):
+        '''
+            Returns the names of the instruments in the store
+        '''
+        return sorted(each for each in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, each)))
+
+    def partitions(self, instrument):
+        '''
+            Returns the days stored for `instrument` as a DatetimeIndex
+        '''
+        path = self._path(instrument)
+        if not os.path.isdir(path):
+            return pd.DatetimeIndex([])
+
+        days = [PARTITION.match(each).group(1) for each in os.listdir(path) if PARTITION.match(each)]
+        return pd.DatetimeIndex(sorted(pd.to_datetime(days)))
+
+    def write(self, instrument, data):
+        '''
+            Adds the rows of `data` to the partitions of `instrument`. Rows whose timestamp is already
+            stored are skipped, and only the partitions that get new rows are rewritten. Returns the
+            rows that were added.
+        '''
+        if len(data) == 0:
+            return data
+
+        path = self._path(instrument)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        data = data[~data.index.duplicated()].sort_index(kind='mergesort')
+
+        # Rows of each day sit next to each other once sorted
+        days = data.index.normalize()
+        bounds = np.flatnonzero(days[1:] != days[:-1]) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(data)]])
+
+        added = []
+        for lo, hi in zip(starts, ends):
+            day = days[lo]
+            part = data.iloc[lo:hi]
+            filename = self._path(instrument, day)
+
+            if os.path.exists(filename):
+                existing = read_frame(filename)
+                part = part[~part.index.isin(existing.index)]
+                if len(part) == 0:
+                    continue
+
+                merged = merge_frames([existing, part]).sort_index(kind='mergesort')
+            else:
+                merged = part
+
+            write_frame(filename, merged)
+            added.append(part)
+
+        if len(added) == 0:
+            return data.iloc[:0]
+
+        added = concat(added)
+        if self.rollups:
+            self.rollup(instrument).update(added)
+
+        return added
+
+    def rollup(self, instrument):
+        '''
+            Returns the Rollup of `instrument`
+        '''
+        return Rollup(os.path.join(self._path(instrument), 'rollup'), levels=self.levels)
+
+    def resample(self, instrument, sample_int, how='mean', start=None, end=None, columns=None):
+        '''
+            Returns the data of `instrument` between `start` and `end` resampled to `sample_int` and
+            aggregated with `how`. The rollup is used when one of its levels divides `sample_int`,
+            otherwise the raw partitions are read.
+        '''
+        if self.rollups:
+            rollup = self.rollup(instrument)
+            if rollup.level_for(sample_int) is not None:
+                return rollup.resample(sample_int, how=how, start=start, end=end, columns=columns)
+
+        data = self.read_range(instrument, start, end, columns=columns).select_dtypes(include=[np.number])
+
+        return getattr(data.resample(sample_int, origin='epoch'), how)()
+
+    def read_range(self, instrument, start=None, end=None, columns=None):
+        '''
+            Returns the data of `instrument` between `start` and `end` (inclusive; a date without a
+            time includes that whole day, like slicing a DataFrame). Only the partitions of those
+            days are opened and only `columns` (all if None) are read from them.
+        '''
+        days = self.partitions(instrument)
+        if start is not None:
+            days = days[days >= pd.Timestamp(start).normalize()]
+        if end is not None:
+            days = days[days <= pd.Timestamp(end).normalize()]
+
+        if len(days) == 0:
+            return DataFrame(columns=columns, index=pd.DatetimeIndex([]))
+
+        data = concat([read_frame(self._path(instrument, day), columns=columns) for day in days])
+
+        return data.loc[start:end]
+
+
+def as_store(store):
+    '''
+        Allows readers to accept either a DataStore or the directory to keep one in
+    '''
+    if store is None or isinstance(store, DataStore):
+        return store
+
+    return DataStore(store)
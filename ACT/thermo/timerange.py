@@ -0,0 +1,34 @@
+"""
+	Time bounds shared by the readers, windows and exports
+"""
+import datetime as dt
+import pandas as pd
+
+
+def _whole_day(value):
+    # A date given without a time, e.g. '8-6-2013' or datetime.date(2013, 8, 6)
+    if isinstance(value, str):
+        return ':' not in value
+    return isinstance(value, dt.date) and not isinstance(value, dt.datetime)
+
+
+def time_bounds(start, end):
+    '''
+        Turns `start` and `end` into Timestamps (or None). An `end` given as a date without a time
+        includes that whole day, like slicing a DataFrame; an `end` with a time (or a Timestamp) is
+        kept as it is, even at midnight.
+
+        >>> time_bounds('8-5-2013', '8-6-2013')
+        (Timestamp('2013-08-05 00:00:00'), Timestamp('2013-08-06 23:59:59.999999999'))
+        >>> time_bounds('8-5-2013 12:00', '8-6-2013 00:00')
+        (Timestamp('2013-08-05 12:00:00'), Timestamp('2013-08-06 00:00:00'))
+    '''
+    if start is not None:
+        start = pd.Timestamp(start)
+    if end is not None:
+        whole = _whole_day(end)
+        end = pd.Timestamp(end)
+        if whole:
+            end = end.normalize() + pd.Timedelta('1D') - pd.Timedelta('1ns')
+
+    return start, end
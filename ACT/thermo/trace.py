@@ -0,0 +1,219 @@
+"""
+	Optional timing and memory instrumentation of the stages of the readers
+"""
+__all__ = ['Tracer', 'stage']
+
+import os
+import json
+import time
+import threading
+import tracemalloc
+import pandas as pd
+from pandas import Series, DataFrame
+
+# The Tracer currently recording (None when tracing is off)
+_active = None
+_local = threading.local()
+
+
+class _NullStage():
+    '''
+        Stands in for a stage when nothing is being traced, so the hooks cost one check
+    '''
+    rows = None
+    bytes = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _NullStage()
+
+
+class _Stage():
+
+    def __init__(self, tracer, name, file=None, rows=None, bytes=None):
+        self.tracer = tracer
+        self.name = name
+        self.file = file
+        self.rows = rows
+        self.bytes = bytes
+        self.child_peak = 0
+        # The peak tracemalloc keeps is process-wide, so only the thread that started the Tracer may reset it
+        self.memory = tracer.memory and threading.get_ident() == tracer.thread
+
+    def __enter__(self):
+        stack = _local.__dict__.setdefault('stack', [])
+        self.parent = stack[-1] if len(stack) > 0 else None
+        stack.append(self)
+
+        if self.memory:
+            tracemalloc.reset_peak()
+
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        _local.stack.pop()
+
+        peak = None
+        if self.memory:
+            # Nested stages reset the peak, so carry theirs up to this one
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            if self.parent is not None:
+                self.parent.child_peak = max(self.parent.child_peak, peak)
+                tracemalloc.reset_peak()
+
+        self.tracer.record(self.name, self.start, seconds, file=self.file, rows=self.rows, bytes=self.bytes, peak=peak)
+        return False
+
+
+def stage(name, file=None, rows=None, bytes=None):
+    '''
+        Returns a context manager that times one stage (e.g. 'parse') of a reader, optionally for
+        one `file`, when a Tracer is active; otherwise it does nothing. `rows` and `bytes` can be
+        set on it before the block ends.
+
+        >>> with stage('resample') as s:
+        ...    data = _resample(data, sample_int)
+        ...    s.rows = len(data)
+    '''
+    if _active is None:
+        return _NULL
+
+    return _Stage(_active, name, file=file, rows=rows, bytes=bytes)
+
+
+def tracing():
+    '''
+        Returns True if a Tracer is recording
+    '''
+    return _active is not None
+
+
+class Tracer():
+    '''
+        Records the wall time, rows, bytes read and (with `memory`) the peak memory allocated by
+        Python of every stage the readers go through (finding the files, parsing each file,
+        merging, resampling, ...) while it is active. Files parsed in worker processes are timed
+        in the workers, and stages run on other threads (e.g. the reads of a Prefetch) in this
+        process, without their memory. `callback` is called with each record as it is made.
+        Tracing costs next to nothing when no Tracer is active.
+
+        >>> with Tracer(memory=True) as tracer:
+        ...    files, nox = read_thermo_dat('nox', runDir=dataDir, processes=4)
+        >>> tracer.summary()
+        >>> tracer.to_chrome('trace.json')
+    '''
+
+    def __init__(self, memory=False, callback=None):
+        self.memory = memory
+        self.callback = callback
+        self.records = []
+        self.lock = threading.Lock()
+        self.previous = None
+        self.thread = None
+
+    def __enter__(self):
+        global _active
+        self.previous = _active
+        self.thread = threading.get_ident()
+        _active = self
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        else:
+            self.started = False
+
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = self.previous
+
+        if self.started:
+            tracemalloc.stop()
+
+        return False
+
+    def record(self, name, start, seconds, file=None, rows=None, bytes=None, peak=None, pid=None, tid=None):
+        '''
+            Adds the record of one stage. `start` is a time.perf_counter() value.
+        '''
+        each = {
+                'stage': name,
+                'file': file,
+                'start': start,
+                'seconds': seconds,
+                'rows': rows,
+                'bytes': bytes,
+                'peak_mb': None if peak is None else peak / 1e6,
+                'pid': os.getpid() if pid is None else pid,
+                'tid': threading.get_ident() if tid is None else tid,
+            }
+
+        with self.lock:
+            self.records.append(each)
+
+        if self.callback is not None:
+            self.callback(each)
+
+    def table(self):
+        '''
+            Returns every record as a DataFrame, one row per stage (and file)
+        '''
+        return DataFrame(self.records, columns=['stage', 'file', 'start', 'seconds', 'rows', 'bytes', 'peak_mb', 'pid', 'tid'])
+
+    def summary(self):
+        '''
+            Returns a DataFrame with the number of calls, total time, rows, bytes, throughput and
+            peak memory of each stage, in the order the stages were first seen
+        '''
+        table = self.table()
+        if len(table) == 0:
+            return DataFrame(columns=['calls', 'seconds', 'rows', 'bytes', 'rows_per_s', 'mb_per_s', 'peak_mb'])
+
+        grouped = table.groupby('stage', sort=False)
+        summary = DataFrame({
+                'calls': grouped.size(),
+                'seconds': grouped['seconds'].sum(),
+                'rows': grouped['rows'].sum(min_count=1),
+                'bytes': grouped['bytes'].sum(min_count=1),
+                'peak_mb': grouped['peak_mb'].max(),
+            })
+        summary.insert(4, 'rows_per_s', summary['rows'] / summary['seconds'])
+        summary.insert(5, 'mb_per_s', summary['bytes'] / 1e6 / summary['seconds'])
+
+        return summary
+
+    def events(self):
+        '''
+            Returns the records as Chrome trace events (complete 'X' events, in microseconds), which
+            chrome://tracing and Perfetto can open
+        '''
+        events = []
+        for each in self.records:
+            args = dict((key, each[key]) for key in ('file', 'rows', 'bytes', 'peak_mb') if each[key] is not None)
+            events.append({
+                    'name': each['stage'],
+                    'cat': 'ACT',
+                    'ph': 'X',
+                    'ts': each['start'] * 1e6,
+                    'dur': each['seconds'] * 1e6,
+                    'pid': each['pid'],
+                    'tid': each['tid'],
+                    'args': args,
+                })
+
+        return events
+
+    def to_chrome(self, filename):
+        '''
+            Writes the trace events to `filename` in the Chrome trace format
+        '''
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': self.events()}, f)
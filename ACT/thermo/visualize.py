@@ -15,16 +15,21 @@ import matplotlib
 import warnings
 import sys
 
+from .diurnal import DiurnalProfile
+from .decimate import decimate, MAX_POINTS
+from .io import _get_instrument, _parse_thermo_dat
+from .window import LazyData, MAX_BYTES, _shift
+
 __all__ = ['diurnal_plot','diurnal_plot_single', 'ThermoPlot']
 
-def diurnal_plot(data, dates=[], shaded=False, title="Diurnal Profile of Trace Gases", xlabel="Local Time: East St. Louis, MO"):
+def diurnal_plot(data, dates=[], shaded=False, title="Diurnal Profile of Trace Gases", xlabel="Local Time: East St. Louis, MO", show=True):
     '''
        
 	   If plotting the entire DataFrame (data), choose all_data=True, else choose all_data=False
 	   and declare the date or dates to plot as a list. `data` should be a pandas core DataFrame 
 	   with time index and each trace gas concentration as a column
        
-       returns a single plot for NOx, SO2, and O3
+       returns a single plot for NOx, SO2, and O3 (show=False returns it without displaying it)
 	   
 	   >>>
 	   
@@ -49,14 +54,8 @@ def diurnal_plot(data, dates=[], shaded=False, title="Diurnal Profile of Trace G
         sys.exit("Dates are not properly configured.")
         
       
-    # Add columns for time to enable simple diurnal trends to be found
-    data['Time'] = data.index.map(lambda x: x.strftime("%H:%M"))
-    
-    # Group the data by time and grab the statistics
-    grouped = data.groupby('Time').describe().unstack()
-    
-    # set the index to be a str
-    grouped.index = pd.to_datetime(grouped.index.astype(str))
+    # Bin the data by minute of the day and grab the statistics
+    grouped = DiurnalProfile(['nox','so2','o3']).update(data).profile()
 
     # Plot
     fig, (ax1, ax2, ax3) = plt.subplots(3, figsize=(10,9), sharex=True)
@@ -110,17 +109,18 @@ def diurnal_plot(data, dates=[], shaded=False, title="Diurnal Profile of Trace G
 
     # Make the layout tight to get rid of some whitespace
     plt.tight_layout()
-    plt.show()
+    if show:
+        plt.show()
     
     return (fig, (ax1, ax2, ax3))
 	
 def diurnal_plot_single(data, model='', dates=[], shaded=False, color1 = 'blue',
                         title="Diurnal Profile of Trace Gases", xlabel="Local Time: East St. Louis, MO", 
-                        ylabel=r'$\ [NO_x]  (ppb)$'):
+                        ylabel=r'$\ [NO_x]  (ppb)$', show=True):
     '''
        `data` should be a pandas core DataFrame with time index and each trace gas concentration as a column
        
-       returns a single plot for one of the three analyzers.
+       returns a single plot for one of the three analyzers (show=False returns it without displaying it).
        
        >>>diurnal_plot_single(data,model='o3', ylabel='O3', shaded=True, color1='green')
 
@@ -138,10 +138,14 @@ def diurnal_plot_single(data, model='', dates=[], shaded=False, color1 = 'blue',
     if model.lower() == 'nox':
         instr = 'nox'
     elif model.lower() == 'so2' or model.lower() == 'sox':
-        instr = 'sox'
+        # The 43I column is so2 (older frames may call it sox)
+        instr = 'sox' if 'sox' in data.columns and 'so2' not in data.columns else 'so2'
     else:
         instr = 'o3'
     
+    if instr not in data.columns:
+        sys.exit("There is no %s column in data to plot" % instr)
+    
     
     # If not plotting all the data, truncate the dataframe to include only the needed data
     if len(dates) == 0:
@@ -156,14 +160,8 @@ def diurnal_plot_single(data, model='', dates=[], shaded=False, color1 = 'blue',
     else:
         sys.exit("You have an error with how you defined your dates")
       
-    # Add columns for time to enable simple diurnal trends to be found
-    data['Time'] = data.index.map(lambda x: x.strftime("%H:%M"))
-    
-    # Group the data by time and grab the statistics
-    grouped = data.groupby('Time').describe().unstack()
-    
-    # set the index to be a str
-    grouped.index = pd.to_datetime(grouped.index.astype(str))
+    # Bin the data by minute of the day and grab the statistics
+    grouped = DiurnalProfile(instr).update(data).profile()
 
     # Plot
     fig, ax = plt.subplots(1, figsize=(8,4))
@@ -198,11 +196,27 @@ def diurnal_plot_single(data, model='', dates=[], shaded=False, color1 = 'blue',
     
     # Make the layout tight to get rid of some whitespace
     plt.tight_layout()
-    plt.show()
+    if show:
+        plt.show()
     
     return (fig, ax)
 
 	
+# Columns debug_plot uses for each model
+DEBUG_COLUMNS = {
+    'o3': ['o3', 'bncht', 'lmpt', 'flowa', 'flowb'],
+    'sox': ['so2', 'intt', 'rctt', 'smplfl'],
+    'nox': ['no', 'no2', 'nox', 'convt', 'intt', 'rctt', 'pmtt', 'smplf', 'ozonf'],
+}
+
+
+def _no2(data):
+    # Windows without any files have no columns at all
+    if 'nox' not in data.columns or 'no' not in data.columns:
+        return data
+    return data.assign(no2=data['nox'] - data['no'])
+
+
 class ThermoPlot(): 
     '''
         Allows for easy plotting of internal instrument data. Currently supports the 
@@ -211,10 +225,70 @@ class ThermoPlot():
             - O3 (49I)
             - SO2 (43I)
 
+        Either pass the DataFrame to plot as `data`, or leave it out and pass the `model` (nox, sox
+        or o3) and `runDir` of the .dat files: then nothing is read until a plot asks for a window
+        (args['start'] and args['end']) and only the files that window needs are read, resampled to
+        `sample_int` and kept in an LRU cache capped at `windows` bytes (or a shared WindowCache).
+        `data` is then loaded in full the first time it is used.
+
+        >>> nox = ThermoPlot(model='nox', runDir=dataDir, start='8-1-2013', end='8-31-2013')
+        >>> f, (a1, a2, a3) = nox.debug_plot({'start': '8-5-2013 12:00', 'end': '8-5-2013 18:00'})
+        >>> f, (a1, a2, a3) = nox.pan()
     '''
     
-    def __init__(self, data):
-        self.data = data
+    def __init__(self, data=None, model=None, runDir=None, sample_int='1min', start=None, end=None, processes=1, cache=None,
+                 compact=False, prefetch=True, windows=MAX_BYTES):
+        self._data = data
+        self.model = model
+        self.loader = None
+        self.last = None
+
+        if data is None:
+            if model is None or runDir is None:
+                sys.exit("ThermoPlot needs either the data to plot or the model and runDir to read it from")
+
+            instrument = _get_instrument(model)
+            self.loader = LazyData(runDir, instrument, 'dat', _parse_thermo_dat, sample_int=sample_int, start=start, end=end,
+                                   derive=_no2 if model == 'nox' else None, processes=processes, cache=cache,
+                                   schema=instrument if compact else None, prefetch=prefetch, windows=windows)
+
+    @property
+    def data(self):
+        '''
+            All of the data, read from runDir the first time it is used
+        '''
+        if self._data is None:
+            self._data = self.loader.window()
+
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    def window(self, start=None, end=None, columns=None):
+        '''
+            Returns the data between `start` and `end`, with only `columns` if set; when reading
+            from runDir only the files that are not cached yet are read
+        '''
+        if self.loader is None:
+            data = self.data.loc[start:end]
+            return data if columns is None else data[[col for col in columns if col in data.columns]]
+
+        return self.loader.window(start, end, columns=columns)
+
+    def pan(self, steps=1):
+        '''
+            Plots the window `steps` window widths after (or before, if negative) the one debug_plot
+            last plotted, with the same arguments
+        '''
+        if self.last is None or self.last.get('start') is None or self.last.get('end') is None:
+            sys.exit("Plot a window with debug_plot({'start': ..., 'end': ...}) before panning")
+
+        args = dict(self.last)
+        args['start'], args['end'] = _shift(args['start'], args['end'], steps)
+
+        return self.debug_plot(args)
         
     def debug_plot(self, args={}):
         
@@ -225,6 +299,11 @@ class ThermoPlot():
 				
 				instrument must be set to either nox, so2, sox, or o3
 				
+				Series longer than args['max_points'] are decimated with args['decimate'] ('minmax' or
+				'lttb') before plotting so spikes survive; set args['decimate'] to None to plot every point.
+				Set args['show'] to False to return the figure without displaying it.
+				Set args['start'] and/or args['end'] to plot only that window (see pan).
+				
 				>>> nox = ThermoPlot(data)
 				>>> f, (a1, a2, a3) = nox.debug_plot()
 		'''
@@ -235,11 +314,24 @@ class ThermoPlot():
                 'ylabtemp':'Temperature (C)',
                 'title_fontsize':'18',
                 'labels_fontsize':'14',
-                'grid':False
+                'grid':False,
+                'decimate':'minmax',
+                'max_points':MAX_POINTS,
+                'show':True
             }
         
+        # Only load the window (and columns) being plotted
+        if args.get('start') is None and args.get('end') is None:
+            data = self.data
+        else:
+            data = self.window(args.get('start'), args.get('end'), columns=DEBUG_COLUMNS.get(self.model))
+        self.last = dict(args)
+        
+        if len(data) == 0:
+            sys.exit("There is no data between %s and %s" % (args.get('start'), args.get('end')))
+        
         # Figure out what model we are trying to plot and set instrument specific default args
-        cols = [i.lower() for i in self.data.columns.values.tolist()]
+        cols = [i.lower() for i in data.columns.values.tolist()]
         
         if 'o3' in cols:
             default_args['instrument'] = 'o3'
@@ -259,10 +351,13 @@ class ThermoPlot():
             sys.exit("Could not figure out what isntrument this is for")
         
         # If kwargs are set, replace the default values
-        for key, val in default_args.iteritems():
-            if args.has_key(key):
+        for key, val in default_args.items():
+            if key in args:
                 default_args[key] = args[key]
                 
+        def _series(col):
+            return decimate(data[col], max_points=default_args['max_points'], method=default_args['decimate'])
+        
         # Set up Plot and all three axes
         fig, (ax1, ax3) = plt.subplots(2, figsize=(10,6), sharex=True)
         ax2 = ax1.twinx()
@@ -279,30 +374,30 @@ class ThermoPlot():
         
         # Plot the debug data on the top graph
         if default_args['instrument'] == 'o3':
-            self.data['bncht'].plot(ax=ax2, label=r'$\ T_{bench}$')
-            self.data['lmpt'].plot(ax=ax2, label=r'$\ T_{lamp}$')
-            self.data['flowa'].plot(ax=ax1, label=r'$\ Q_{A}$', style='--')
-            self.data['flowb'].plot(ax=ax1, label=r'$\ Q_{B}$', style='--')
+            _series('bncht').plot(ax=ax2, label=r'$\ T_{bench}$')
+            _series('lmpt').plot(ax=ax2, label=r'$\ T_{lamp}$')
+            _series('flowa').plot(ax=ax1, label=r'$\ Q_{A}$', style='--')
+            _series('flowb').plot(ax=ax1, label=r'$\ Q_{B}$', style='--')
 
-            self.data['o3'].plot(ax=ax3, color=default_args['color_o3'], label=r'$\ O_{3}$')
+            _series('o3').plot(ax=ax3, color=default_args['color_o3'], label=r'$\ O_{3}$')
         elif default_args['instrument'] == 'so2':
-            self.data['intt'].plot(ax=ax2, label=r'$\ T_{internal}$')
-            self.data['rctt'].plot(ax=ax2, label=r'$\ T_{reactor}$')
-            self.data['smplfl'].plot(ax=ax1, label=r'$\ Q_{sample}$', style='--')
+            _series('intt').plot(ax=ax2, label=r'$\ T_{internal}$')
+            _series('rctt').plot(ax=ax2, label=r'$\ T_{reactor}$')
+            _series('smplfl').plot(ax=ax1, label=r'$\ Q_{sample}$', style='--')
             
-            self.data['so2'].plot(ax=ax3, label=r'$\ SO_2 $', color=default_args['color_so2'], ylim=[0,self.data['so2'].max()*1.05])
+            _series('so2').plot(ax=ax3, label=r'$\ SO_2 $', color=default_args['color_so2'], ylim=[0,data['so2'].max()*1.05])
         else:
-            m = max(self.data['convt'].max(),self.data['intt'].max(),self.data['pmtt'].max())
-            self.data['convt'].plot(ax=ax2, label=r'$\ T_{converter}$') 
-            self.data['intt'].plot(ax=ax2, label=r'$\ T_{internal}$')
-            self.data['rctt'].plot(ax=ax2, label=r'$\ T_{reactor}$')
-            self.data['pmtt'].plot(ax=ax2, label=r'$\ T_{PMT}$')
-            self.data['smplf'].plot(ax=ax1, label=r'$\ Q_{sample}$', style='--')
-            self.data['ozonf'].plot(ax=ax1, label=r'$\ Q_{ozone}$', style='--')
+            m = max(data['convt'].max(),data['intt'].max(),data['pmtt'].max())
+            _series('convt').plot(ax=ax2, label=r'$\ T_{converter}$') 
+            _series('intt').plot(ax=ax2, label=r'$\ T_{internal}$')
+            _series('rctt').plot(ax=ax2, label=r'$\ T_{reactor}$')
+            _series('pmtt').plot(ax=ax2, label=r'$\ T_{PMT}$')
+            _series('smplf').plot(ax=ax1, label=r'$\ Q_{sample}$', style='--')
+            _series('ozonf').plot(ax=ax1, label=r'$\ Q_{ozone}$', style='--')
             
-            self.data['no'].plot(ax=ax3, label=r'$\ NO $', color=default_args['color_no'])
-            self.data['no2'].plot(ax=ax3, label=r'$\ NO_{2}$', color=default_args['color_no2'])
-            self.data['nox'].plot(ax=ax3, label=r'$\ NO_{x}$', color=default_args['color_nox'], ylim=(0,math.ceil(self.data.nox.max()*1.05)))
+            _series('no').plot(ax=ax3, label=r'$\ NO $', color=default_args['color_no'])
+            _series('no2').plot(ax=ax3, label=r'$\ NO_{2}$', color=default_args['color_no2'])
+            _series('nox').plot(ax=ax3, label=r'$\ NO_{x}$', color=default_args['color_nox'], ylim=(0,math.ceil(data.nox.max()*1.05)))
     
            
         # Legends
@@ -319,6 +414,7 @@ class ThermoPlot():
         
         # More of the things..
         plt.tight_layout()
-        plt.show()
+        if default_args['show']:
+            plt.show()
         
         return fig, (ax1, ax2, ax3)
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+	Lazy, windowed access to a directory of data files with an LRU cache of what has been loaded
+"""
+__all__ = ['WindowCache', 'LazyData']
+
+import os
+import threading
+import collections
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+from .io import get_index, _resample
+from .ingest import parse_files, merge_frames, concat
+from .trace import stage
+from .timerange import time_bounds
+
+# Default memory cap of a WindowCache
+MAX_BYTES = 512 * 2**20
+
+
+def _nbytes(data):
+    return int(data.memory_usage(index=True, deep=True).sum())
+
+
+class WindowCache():
+    '''
+        Least recently used cache of DataFrames (parsed files and loaded windows) holding no more
+        than `max_bytes` of them; the least recently used ones are dropped first. A single entry
+        bigger than the cap is kept until the next one is added.
+
+        >>> cache = WindowCache(max_bytes=2 * 2**30)
+        >>> vaps = VAPS_Debug(runDir, windows=cache)
+    '''
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        '''
+            Returns the entry stored under `key` (None if there is not one) and marks it as used
+        '''
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+
+    def put(self, key, data):
+        size = _nbytes(data)
+
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.entries.pop(key)[1]
+
+            self.entries[key] = (data, size)
+            self.nbytes += size
+
+            while self.nbytes > self.max_bytes and len(self.entries) > 1:
+                self.nbytes -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def info(self):
+        '''
+            Returns the number of entries, the bytes they hold, the cap and the hits and misses so far
+        '''
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.nbytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def _shift(start, end, steps):
+    '''
+        Moves the window from `start` to `end` by `steps` times its width. The window returned ends
+        1ns before the next one starts, so windows panned through never share a row.
+    '''
+    first, last = time_bounds(start, end)
+    width = last - first
+    if (width + pd.Timedelta('1ns')) % pd.Timedelta('1s') == pd.Timedelta(0):
+        # `last` is 1ns before a whole second (a whole day or a window panned before)
+        width = width + pd.Timedelta('1ns')
+
+    first = first + steps * width
+
+    return first, first + width - pd.Timedelta('1ns')
+
+
+class LazyData():
+    '''
+        Loads the files of `instrument` (with extension `fileType`) in `runDir` only when a time
+        window of them is asked for. The directory is listed through its FileIndex, each file is
+        parsed with `parser` (then passed through `clean`, if set) the first time a window needs
+        it, and both the parsed files and the windows built from them are kept in `windows`, a
+        WindowCache (or its memory cap in bytes), so panning to an adjacent window only reads the
+        files that were not loaded yet. `derive` adds computed columns to the raw rows of a window
+        before they are resampled to `sample_int` (None keeps the raw rows); it must return a new
+        frame rather than change the one it is given. Rows repeated where files overlap are kept
+        once unless `dedupe` is False. `start` and `end` limit every window.
+
+        >>> nox = LazyData(dataDir, '42I', 'dat', _parse_thermo_dat, sample_int='1min')
+        >>> afternoon = nox.window('8-5-2013 12:00', '8-5-2013 18:00', columns=['nox', 'no'])
+    '''
+
+    def __init__(self, runDir, instrument, fileType, parser, sample_int=None, start=None, end=None, clean=None,
+                 derive=None, dedupe=True, processes=1, cache=None, schema=None, prefetch=True, windows=MAX_BYTES):
+        self.runDir = runDir
+        self.instrument = instrument
+        self.fileType = fileType
+        self.parser = parser
+        self.sample_int = sample_int
+        self.start, self.end = time_bounds(start, end)
+        self.clean = clean
+        self.derive = derive
+        self.dedupe = dedupe
+        self.processes = processes
+        self.cache = cache
+        self.schema = schema
+        self.prefetch = prefetch
+        self.windows = windows if isinstance(windows, WindowCache) else WindowCache(windows)
+        self.index = get_index(runDir)
+
+    def files(self, start=None, end=None):
+        '''
+            Returns the names of the files that may hold rows between `start` and `end`. Files dated
+            the day before `start` are included since they may run past midnight.
+        '''
+        start, end = self._limit(start, end)
+        first = None if start is None else start.normalize() - pd.Timedelta('1D')
+
+        return self.index.query(self.instrument, self.fileType, start=first, end=end)
+
+    def _limit(self, start, end):
+        start, end = time_bounds(start, end)
+        if self.start is not None:
+            start = self.start if start is None else max(start, self.start)
+        if self.end is not None:
+            end = self.end if end is None else min(end, self.end)
+
+        return start, end
+
+    def _key(self, name):
+        # A file that changes on disk gets a new key, so it is read again
+        path = os.path.join(self.runDir, name)
+        st = os.stat(path)
+
+        return ('file', os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    def _frames(self, names, keys):
+        '''
+            Returns the parsed frame of each of `names`, parsing only the ones not in the cache
+        '''
+        frames = [self.windows.get(key) for key in keys]
+
+        missing = [i for i, each in enumerate(frames) if each is None]
+        if len(missing) > 0:
+            parsed = parse_files([os.path.join(self.runDir, names[i]) for i in missing], self.parser, processes=self.processes,
+                                 cache=self.cache, schema=self.schema, prefetch=self.prefetch)
+            for i, data in zip(missing, parsed):
+                if self.clean is not None:
+                    with stage('clean', file=names[i], rows=len(data)):
+                        data = self.clean(data, names[i])
+                self.windows.put(keys[i], data)
+                frames[i] = data
+
+        return frames
+
+    def window(self, start=None, end=None, columns=None):
+        '''
+            Returns the (resampled) rows between `start` and `end`, with only `columns` if set.
+            Rows are cut at `start` and `end` before resampling, so the bins at the edges only
+            average the rows inside the window.
+            Windows that were built before from files that have not changed are returned from the
+            cache; treat them as read-only.
+        '''
+        start, end = self._limit(start, end)
+        names = self.files(start, end)
+        keys = [self._key(name) for name in names]
+
+        key = ('window', start, end, None if columns is None else tuple(columns), self.sample_int, tuple(keys))
+        data = self.windows.get(key)
+        if data is not None:
+            return data
+
+        frames = self._frames(names, keys)
+
+        with stage('merge') as s:
+            if len(frames) > 0:
+                data = merge_frames(frames) if self.dedupe else concat(frames)
+            else:
+                data = DataFrame(index=pd.DatetimeIndex([]))
+            if not data.index.is_monotonic_increasing:
+                data = data.sort_index(kind='mergesort')
+            s.rows = len(data)
+
+        if start is not None or end is not None:
+            data = data.loc[start:end]
+
+        if self.derive is not None:
+            data = self.derive(data)
+
+        if columns is not None:
+            data = data[[col for col in columns if col in data.columns]]
+
+        if self.sample_int is not None:
+            with stage('resample', rows=len(data)):
+                data = _resample(data, self.sample_int)
+
+        self.windows.put(key, data)
+
+        return data
@@ -0,0 +1,172 @@
+"""
+	Functions used to stream data out of large .xlsx workbooks and keep a binary copy of them
+"""
+__all__ = ['iter_xlsx', 'read_xlsx']
+
+import os
+import warnings
+import operator
+import numpy as np
+import pandas as pd
+from pandas import Series, DataFrame
+
+from .cache import write_frame, read_frame, read_meta
+from .trace import stage
+from .timerange import time_bounds
+
+# Bump this whenever the layout of the sidecar files changes so old ones are rebuilt
+SIDECAR_VERSION = 1
+
+
+def _between(data, start, end):
+    if start is None and end is None:
+        return data
+
+    keep = np.ones(len(data), dtype=bool)
+    if start is not None:
+        keep &= data.index >= start
+    if end is not None:
+        keep &= data.index <= end
+
+    return data if keep.all() else data[keep]
+
+
+def iter_xlsx(filename, sheetname='Sheet1', skiprows=0, columns=None, start=None, end=None, chunksize=50000):
+    '''
+        Reads one sheet of an .xlsx workbook row by row with openpyxl's read-only mode and yields
+        it as DataFrames of up to `chunksize` rows, so the workbook is never held in memory at once.
+        The first column is the (date) index and the row after the `skiprows` skipped rows is the
+        header. Only the `columns` asked for are converted (all if None) and only the rows between
+        `start` and `end` are kept.
+
+        >>>for chunk in iter_xlsx("SLAQRS.xlsx", skiprows=1, columns=['nox', 'o3'], start='8-1-2013', end='8-7-2013'):
+        ...    print(chunk.mean())
+    '''
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("Streaming .xlsx files needs the openpyxl package")
+
+    start, end = time_bounds(start, end)
+
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[sheetname] if isinstance(sheetname, int) else workbook[sheetname]
+        rows = sheet.iter_rows(min_row=skiprows + 1, values_only=True)
+
+        header = next(rows, None)
+        if header is None:
+            return
+
+        names = ['' if name is None else str(name) for name in header[1:]]
+        if columns is None:
+            columns = [name for name in names if name != '']
+        else:
+            missing = [col for col in columns if col not in names]
+            if len(missing) > 0:
+                warnings.warn("Columns %s are not in %s" % (missing, filename))
+            columns = [col for col in columns if col in names]
+
+        positions = [names.index(col) + 1 for col in columns]
+        width = max(positions) + 1 if len(positions) > 0 else 1
+        pick = operator.itemgetter(*positions) if len(positions) > 1 else None
+        indexName = None if header[0] is None else str(header[0])
+
+        index = []
+        values = []
+        for row in rows:
+            if len(row) == 0 or row[0] is None:
+                continue
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+
+            index.append(row[0])
+            if pick is not None:
+                values.append(pick(row))
+            elif len(positions) == 1:
+                values.append((row[positions[0]],))
+
+            if len(index) == chunksize:
+                yield _between(_chunk(index, values, columns, indexName), start, end)
+                index = []
+                values = []
+
+        if len(index) > 0:
+            yield _between(_chunk(index, values, columns, indexName), start, end)
+    finally:
+        workbook.close()
+
+
+def _chunk(index, values, columns, indexName):
+    values = list(zip(*values)) if len(values) > 0 else [() for col in columns]
+    data = DataFrame(dict((i, Series(col)) for i, col in enumerate(values)), index=range(len(index)))
+    data.columns = columns
+    data.index = pd.DatetimeIndex(pd.to_datetime(Series(index, dtype=object), errors='coerce').values, name=indexName)
+
+    # Rows whose first cell is not a date (notes, totals, ...) are not data
+    return data[data.index.notnull()]
+
+
+def _sidecar(filename, sheetname, sidecar):
+    '''
+        Path of the binary copy of one sheet: next to the workbook if `sidecar` is True, or in
+        the directory `sidecar`
+    '''
+    folder, name = os.path.split(os.path.abspath(filename))
+    if sidecar is not True:
+        folder = sidecar
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+    return os.path.join(folder, '.%s.%s.npz' % (name, sheetname))
+
+
+def read_xlsx(filename, sheetname='Sheet1', skiprows=0, columns=None, start=None, end=None, sidecar=True):
+    '''
+        Reads one sheet of an .xlsx workbook with iter_xlsx (see there for the arguments) into one
+        DataFrame. If `sidecar` is True (or a directory) the whole sheet is also saved as a binary
+        columnar file next to the workbook (or in that directory), which is used instead of the
+        workbook for as long as the workbook's size and modification time are unchanged; reading
+        it takes a fraction of a second, and only the `columns` asked for are loaded from it.
+        Pass sidecar=False to always read the workbook.
+
+        >>>nox = read_xlsx("C:/Users/David/Dropbox/SLAQRS/SLAQRS.xlsx", skiprows=1, columns=['nox'])
+    '''
+    if not sidecar:
+        with stage('parse', file=filename) as s:
+            chunks = list(iter_xlsx(filename, sheetname, skiprows=skiprows, columns=columns, start=start, end=end))
+            data = pd.concat(chunks) if len(chunks) > 0 else DataFrame(columns=columns or [], index=pd.DatetimeIndex([]))
+            s.rows = len(data)
+        return data
+
+    st = os.stat(filename)
+    entry = _sidecar(filename, sheetname, sidecar)
+    key = {'size': st.st_size, 'mtime': st.st_mtime_ns, 'skiprows': skiprows, 'version': SIDECAR_VERSION}
+
+    data = None
+    if os.path.exists(entry):
+        try:
+            meta = read_meta(entry)
+            if all(meta.get(k) == v for k, v in key.items()):
+                with stage('sidecar', file=entry) as s:
+                    data = read_frame(entry, columns=columns)
+                    s.rows = len(data)
+        except Exception:
+            warnings.warn("Could not read the sidecar of %s; reading the workbook again" % filename)
+
+    if data is None:
+        # Read the whole sheet once so later reads of any columns or dates can use the sidecar
+        with stage('parse', file=filename) as s:
+            chunks = list(iter_xlsx(filename, sheetname, skiprows=skiprows))
+            data = pd.concat(chunks) if len(chunks) > 0 else DataFrame(index=pd.DatetimeIndex([]))
+            s.rows = len(data)
+
+        try:
+            write_frame(entry, data, meta=dict(key, source=os.path.abspath(filename), sheet=str(sheetname)))
+        except Exception:
+            warnings.warn("Could not write the sidecar of %s" % filename)
+
+        if columns is not None:
+            data = data[[col for col in columns if col in data.columns]]
+
+    return _between(data, *time_bounds(start, end))
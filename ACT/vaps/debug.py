@@ -6,48 +6,98 @@ import glob
 import re
 import sys
 import warnings
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 
-from ..thermo.io import get_files, numericalSort
+from ..thermo.io import get_files, numericalSort, _resample
+from ..thermo.ingest import parse_files, concat
+from ..thermo.store import as_store
+from ..thermo.decimate import decimate, MAX_POINTS
+from ..thermo.trace import stage
+from ..thermo.prefetch import as_source
+from ..thermo.qc import qc_flags, QC_FLAGS
+from ..thermo.window import LazyData, MAX_BYTES, _shift
 
 __all__ = ['read_data_vaps','VAPS_Debug']
 
 
-def valid_row(ind):
-    return True if (type(pd.to_datetime(ind)) is pd.tslib.Timestamp) else False
+def clean_short_rows(data, return_dropped=False):
+    '''
+    Cleans up all short rows in time-indexed dataframe, i.e. rows whose timestamp can not be parsed.
+    Returns clean df (and the number of rows dropped if `return_dropped` is True)
+    '''
+    index = data.index
+    if not isinstance(index, pd.DatetimeIndex):
+        index = pd.to_datetime(index, errors='coerce')
+
+    valid = ~pd.isnull(index)
+    dropped = len(valid) - int(valid.sum())
+
+    if dropped > 0:
+        data = data[valid]
+        index = index[valid]
+
+    if data.index is not index:
+        data = data.set_axis(index, axis=0)
+
+    if return_dropped:
+        return data, dropped
 
-def clean_short_rows(data):
+    return data
+
+
+def _parse_vaps_txt(filename):
     '''
-    Cleans up all short rows in time-indexed dataframe. Returns clean df
+    Parses a single VAPS output file
     '''
-    data['tmp'] = data.index
-    data['tmp'] = data['tmp'].apply(valid_row)
-    data = data[data['tmp'] == True]
-    del data['tmp']
-    data.index = pd.to_datetime(data.index)
+    return pd.read_table(as_source(filename), sep='\t', header=0, parse_dates=True, index_col='Date/Time', on_bad_lines='warn')
+
+
+def _clean_vaps(data, filename):
+    data, dropped = clean_short_rows(data, return_dropped=True)
+    if dropped > 0:
+        warnings.warn("Dropped %d short rows from %s" % (dropped, filename))
 
     return data
 
 
-def read_data_vaps(runDir=os.getcwd(), sample_int='5S', start=None, end=None):
+def read_data_vaps(runDir=os.getcwd(), sample_int='5S', start=None, end=None, processes=1, cache=None, compact=False, store=None, prefetch=True):
     '''
     Reads the vaps output files and imports data into beautiful dataframes for easy visualization.
+    `processes` sets the number of worker processes used to parse the files (None uses one per cpu).
+    `cache` is a ParseCache (or directory for one) used to skip re-parsing files that have not changed.
+    `compact` converts each file to the compact dtypes registered for 'Vaps' as it is parsed.
+    `store` is a DataStore (or directory for one) the raw data is added to, under 'Vaps'.
+    `prefetch` reads the next files on threads while one is parsed (a Prefetch, True, a byte budget
+    or False); it is only used when processes=1.
 
     >>>data = read_data_vaps("C:/Users/David/Desktop/VAPS Data/")
     '''
 
     # Get the list of files
-    files = get_files("Vaps", fileType='txt', runDir=runDir, start=start, end=end)
+    with stage('get_files') as s:
+        files = get_files("Vaps", fileType='txt', runDir=runDir, start=start, end=end)
+        s.rows = len(files)
+
+    # Parse the files and drop the short rows of each one
+    frames = parse_files([os.path.join(runDir, each) for each in files], _parse_vaps_txt, processes=processes, cache=cache,
+                         schema='Vaps' if compact else None, prefetch=prefetch)
 
-    data = pd.DataFrame()
+    for i, each in enumerate(files):
+        with stage('clean', file=each, rows=len(frames[i])):
+            frames[i] = _clean_vaps(frames[i], each)
 
-    for each in files:
-        newData = pd.read_table(each, sep='\t', header=0, parse_dates=True, index_col='Date/Time', error_bad_lines=True)
-        data = pd.concat([data, newData])
+    # Concatenate them all at once
+    with stage('merge') as s:
+        data = concat(frames) if len(frames) > 0 else pd.DataFrame(index=pd.DatetimeIndex([]))
+        s.rows = len(data)
 
-    data = clean_short_rows(data)
-    data = data.resample(sample_int)
+    if store is not None:
+        with stage('store') as s:
+            s.rows = len(as_store(store).write('Vaps', data))
+
+    with stage('resample', rows=len(data)):
+        data = _resample(data, sample_int)
 
     return data
 
@@ -61,37 +111,114 @@ class VAPS_Debug:
 
     '''
 
-    def __init__(self, runDir, start=None, end=None, sample_int='5S'):
+    def __init__(self, runDir, start=None, end=None, sample_int='5S', processes=1, cache=None, compact=False, prefetch=True,
+                 windows=MAX_BYTES):
         self.runDir =runDir
-        self.data = read_data_vaps(runDir, sample_int=sample_int, start=start, end=end)
+        self.start = start
+        self.end = end
         self.title = "VAPS Trap Thermocouple Data"
         self.xlabel = "Timestamp"
         self.ylabel = "Temperature (C)"
 
-        # Eliminate all data where TC value is less than zero because that's just ridiculous
-        self.data = self.data[self.data > 0]
+        # Nothing is read until some data is asked for; the parsed files and the windows built from
+        # them are kept in an LRU cache capped at `windows` bytes (or a shared WindowCache)
+        self.loader = LazyData(runDir, "Vaps", 'txt', _parse_vaps_txt, sample_int=sample_int, start=start, end=end,
+                               clean=_clean_vaps, dedupe=False, processes=processes, cache=cache,
+                               schema='Vaps' if compact else None, prefetch=prefetch, windows=windows)
+        self._data = None
+        self._flags = None
+        self.last = None
+
+    def window(self, start=None, end=None, columns=None):
+        '''
+        Returns the resampled data between `start` and `end` (within the range the VAPS_Debug was
+        opened with), with only `columns` if set, reading only the files that are not cached yet.
+        Thermocouple readings at or below zero are blanked.
+        '''
+        data, flags = self._window(start, end, columns)
+
+        return data
+
+    def _window(self, start, end, columns):
+        data = self.loader.window(start, end, columns=columns)
+
+        # Blank the thermocouple readings at or below zero because that's just ridiculous; the QC
+        # rules registered for 'Vaps' only cover the TC columns, so the other columns are kept
+        flags = qc_flags(data, 'Vaps', by_column=True)
+        blanked = {}
+        for col in flags.columns:
+            bad = (flags[col].values & QC_FLAGS['range']) > 0
+            if bad.any():
+                blanked[col] = data[col].where(~bad)
+
+        return (data.assign(**blanked) if len(blanked) > 0 else data), flags
+
+    @property
+    def data(self):
+        '''
+        All of the data between `start` and `end`, loaded the first time it is used
+        '''
+        if self._data is None:
+            self._data, self._flags = self._window(None, None, None)
+
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        # The flags of the data replaced no longer apply
+        self._data = value
+        self._flags = None
+
+    @property
+    def flags(self):
+        '''
+        The QC flags of each thermocouple column of `data` (see qc_flags)
+        '''
+        if self._flags is None:
+            self._flags = qc_flags(self.data, 'Vaps', by_column=True)
+
+        return self._flags
 
-    def plot_trap(self, args={}):
+    def plot_trap(self, args={}, decimate_method='minmax', max_points=MAX_POINTS, show=True, start=None, end=None):
         '''
         Plots the thermocouple data for the VAPS Trap. dates must be in format to select from normal dataframe
+        Columns longer than max_points are decimated with decimate_method ('minmax' or 'lttb') before
+        plotting; decimate_method=None plots every point. show=False returns the figure without displaying it.
+        If `start` or `end` is set only that window of the columns in args is loaded (see pan).
+
+        >>>vaps.plot_trap(args, start='4-28-2013 14:00', end='4-28-2013 18:00')
+        >>>vaps.pan()
         '''
 
+        # Only import matplotlib when something is plotted
+        import matplotlib.pyplot as plt
+
+        # Figure out what else I need to plot
+        if len(args) == 0:
+            sys.exit("There are no columns to plot! Please select some :)")
+
+        if start is None and end is None:
+            data = self.data
+        else:
+            data = self.window(start, end, columns=list(args))
+        self.last = (start, end, args, decimate_method, max_points, show)
+
+        if len(data) == 0:
+            sys.exit("There is no data between %s and %s" % (start, end))
+
         # Plot some shit!
         fig, ax = plt.subplots(1, figsize=(10,6))
         ax.set_title(self.title, fontsize=16)
         ax.set_xlabel(self.xlabel, fontsize=14)
         ax.set_ylabel(self.ylabel, fontsize=14)
 
-        # Figure out what else I need to plot
-        if len(args) == 0:
-            sys.exit("There are no columns to plot! Please select some :)")
-
-        for key, value in args.iteritems():
+        for key, value in args.items():
             try:
-                if args[key].has_key('color'):
-                    self.data[key].plot(color=value['color'], label=value['label'])
+                series = decimate(data[key], max_points=max_points, method=decimate_method)
+                if 'color' in args[key]:
+                    series.plot(color=value['color'], label=value['label'])
                 else:
-                    self.data[key].plot(label=value['label'])
+                    series.plot(label=value['label'])
             except:
                 warnings.warn("Could not plot %s" % key)
 
@@ -100,6 +227,20 @@ class VAPS_Debug:
 
 
         plt.tight_layout()
-        plt.show()
+        if show:
+            plt.show()
+
+        return fig, ax
+
+    def pan(self, steps=1):
+        '''
+        Plots the window `steps` window widths after (or before, if negative) the one plot_trap last
+        plotted, with the same arguments. Only files that are not cached yet are read.
+        '''
+        if self.last is None or self.last[0] is None or self.last[1] is None:
+            sys.exit("Plot a window with plot_trap(start=..., end=...) before panning")
+
+        start, end, args, decimate_method, max_points, show = self.last
+        start, end = _shift(start, end, steps)
 
-        return fig, ax
\ No newline at end of file
+        return self.plot_trap(args, decimate_method=decimate_method, max_points=max_points, show=show, start=start, end=end)
@@ -0,0 +1,61 @@
+"""
+	Compares the dedicated .dat parser with the pd.read_table fallback of read_thermo_dat(engine='pandas')
+
+	>>>python benchmarks/bench_dat.py --days 3 --freq 1s
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import warnings
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ACT.thermo.dat import parse_dat
+from ACT.thermo.io import _read_table_thermo_dat
+from generators import write_thermo_dat
+
+
+def timeit(func, filename, repeat):
+    best = None
+    for i in range(repeat):
+        t = time.time()
+        func(filename)
+        elapsed = time.time() - t
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--model', default='nox')
+    parser.add_argument('--days', type=int, default=2)
+    parser.add_argument('--freq', default='1s')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    runDir = tempfile.mkdtemp()
+    try:
+        files = write_thermo_dat(runDir, model=args.model, days=args.days, freq=args.freq)
+
+        for filename in files:
+            size = os.path.getsize(filename) / 1e6
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                slow = timeit(_read_table_thermo_dat, filename, args.repeat)
+
+            fast = timeit(parse_dat, filename, args.repeat)
+            mapped = timeit(lambda f: parse_dat(f, use_mmap=True), filename, args.repeat)
+
+            print('%s (%.1f MB): read_table %.3fs, parse_dat %.3fs, parse_dat(mmap) %.3fs, speedup %.1fx' % (
+                    os.path.basename(filename), size, slow, fast, mapped, slow / fast))
+    finally:
+        shutil.rmtree(runDir)
+
+
+if __name__ == '__main__':
+    main()
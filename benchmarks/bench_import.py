@@ -0,0 +1,68 @@
+"""
+	Times `import ACT` in fresh interpreters and checks that plotting modules are not loaded by it
+
+	>>>python benchmarks/bench_import.py --repeat 10 --max-seconds 1.5
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Modules that `import ACT` must not load
+HEAVY = ['matplotlib', 'matplotlib.pyplot', 'xlrd', 'openpyxl']
+
+PROBE = '''
+import sys, time, json
+t = time.perf_counter()
+import ACT
+elapsed = time.perf_counter() - t
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+''' % HEAVY
+
+
+def run_once(module=None):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get('PYTHONPATH', '')]))
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    code = PROBE if module is None else PROBE.replace('import ACT\n', 'import ACT\n%s\n' % module)
+    out = subprocess.check_output([sys.executable, '-c', code], env=env)
+
+    return json.loads(out.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=None, help='fail if the median import takes longer')
+    parser.add_argument('--out', default=None, help='write the timings to this JSON file')
+    args = parser.parse_args()
+
+    runs = [run_once() for i in range(args.repeat)]
+    times = sorted(each['seconds'] for each in runs)
+    median = times[len(times) // 2]
+    loaded = sorted(set(m for each in runs for m in each['loaded']))
+
+    # The first use of a plotting name should still work and pull matplotlib in
+    lazy = run_once('ACT.ThermoPlot')
+
+    print('import ACT: median %.3fs, best %.3fs over %d runs' % (median, times[0], len(times)))
+    print('heavy modules loaded by import ACT: %s' % (', '.join(loaded) or 'none'))
+    print('import ACT + ACT.ThermoPlot: %.3fs' % lazy['seconds'])
+
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump({'median': median, 'times': times, 'loaded': loaded, 'lazy': lazy}, f, indent=2)
+
+    failed = len(loaded) > 0
+    if args.max_seconds is not None and median > args.max_seconds:
+        print('median import time is over %.3fs' % args.max_seconds)
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
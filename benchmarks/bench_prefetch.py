@@ -0,0 +1,76 @@
+"""
+	Times read_thermo_dat and read_data_vaps with and without read-ahead on a simulated slow
+	(network or synced) directory, where opening each file costs a fixed latency
+
+	>>>python benchmarks/bench_prefetch.py --days 14 --latency 0.1
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import builtins
+import tempfile
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ACT.thermo.io import read_thermo_dat
+from ACT.thermo.prefetch import Prefetch
+from ACT.vaps.debug import read_data_vaps
+from generators import write_thermo_dat, write_vaps_txt
+
+
+def slow_open(runDir, latency):
+    '''
+        Returns a replacement for open() that sleeps `latency` seconds before opening a file in `runDir`
+    '''
+    real = builtins.open
+    runDir = os.path.abspath(runDir)
+
+    def _open(file, *args, **kwargs):
+        if isinstance(file, str) and os.path.abspath(file).startswith(runDir):
+            time.sleep(latency)
+        return real(file, *args, **kwargs)
+
+    return real, _open
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds added to every open')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--budget', type=int, default=64, help='read-ahead budget in MB')
+    args = parser.parse_args()
+
+    runDir = tempfile.mkdtemp(prefix='act_prefetch_')
+    try:
+        write_thermo_dat(runDir, 'nox', days=args.days, freq='10s')
+        write_vaps_txt(runDir, days=args.days, freq='5s')
+
+        readers = [
+            ('read_thermo_dat', lambda prefetch: read_thermo_dat('nox', runDir=runDir, prefetch=prefetch)),
+            ('read_data_vaps', lambda prefetch: read_data_vaps(runDir, prefetch=prefetch)),
+        ]
+
+        real, _open = slow_open(runDir, args.latency)
+        builtins.open = _open
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                for name, func in readers:
+                    times = []
+                    for prefetch in (False, Prefetch(threads=args.threads, budget=args.budget * 2**20)):
+                        t = time.perf_counter()
+                        func(prefetch)
+                        times.append(time.perf_counter() - t)
+                    print('%-16s serial %.3fs  prefetch %.3fs  (%.1fx)' % (name, times[0], times[1], times[0] / times[1]))
+        finally:
+            builtins.open = real
+    finally:
+        shutil.rmtree(runDir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+	Times the file discovery, readers, de-duplication, resampling and diurnal aggregation on synthetic data
+
+	>>>python benchmarks/bench_suite.py --days 7 --freq 10s --out results.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import warnings
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ACT.thermo.io import FileIndex, read_thermo_dat, read_thermo_csv, read_thermo_xlsx, _parse_thermo_dat, _resample
+from ACT.thermo.ingest import parse_files, merge_frames
+from ACT.thermo.diurnal import DiurnalProfile
+from ACT.vaps.debug import read_data_vaps
+from generators import MODELS, write_thermo_dat, write_thermo_csv, write_thermo_xlsx, write_vaps_txt
+
+
+def measure(name, func, repeat, rows=None, nbytes=None):
+    '''
+        Runs `func` `repeat` times and once more under tracemalloc, and returns the best wall time,
+        the throughput and the peak memory allocated by Python as a dict. `rows` may be a function
+        of the result. Errors are recorded instead of stopping the suite.
+    '''
+    result = {'name': name}
+    try:
+        best = None
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for i in range(repeat):
+                t = time.perf_counter()
+                out = func()
+                elapsed = time.perf_counter() - t
+                best = elapsed if best is None else min(best, elapsed)
+
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    except Exception as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+        print('%-28s failed: %s' % (name, result['error']))
+        return result
+
+    n = rows(out) if callable(rows) else rows
+    result.update({
+            'seconds': best,
+            'rows': n,
+            'bytes': nbytes,
+            'rows_per_s': n / best if n and best > 0 else None,
+            'mb_per_s': nbytes / 1e6 / best if nbytes and best > 0 else None,
+            'peak_mb': peak / 1e6,
+        })
+
+    print('%-28s %8.3fs %12s rows/s %8s MB/s %8.1f MB peak' % (name, best,
+            '%.0f' % result['rows_per_s'] if result['rows_per_s'] else '-',
+            '%.1f' % result['mb_per_s'] if result['mb_per_s'] else '-', result['peak_mb']))
+
+    return result
+
+
+def run(runDir, args):
+    results = []
+
+    # Write the synthetic campaign
+    files = dict((model, write_thermo_dat(runDir, model=model, days=args.days, freq=args.freq)) for model in MODELS)
+    vaps = write_vaps_txt(runDir, days=args.days, freq=args.vaps_freq)
+    csv = write_thermo_csv(os.path.join(runDir, 'export.csv'), days=args.days, freq=args.freq)
+    xlsx = write_thermo_xlsx(os.path.join(runDir, 'export.xlsx'), days=min(args.days, args.xlsx_days), freq=args.freq)
+
+    size = lambda paths: sum(os.path.getsize(each) for each in paths)
+    lines = lambda paths: sum(sum(1 for line in open(each)) - 1 for each in paths)
+
+    # File discovery, from a cold index and from a warm one
+    results.append(measure('get_files (cold)', lambda: FileIndex(runDir).query('42I', 'dat'), args.repeat, rows=len))
+    index = FileIndex(runDir)
+    results.append(measure('get_files (warm)', lambda: index.query('42I', 'dat', start=pd.Timestamp('2013-08-06')),
+                           args.repeat, rows=len))
+
+    # Readers
+    for model, paths in files.items():
+        results.append(measure('read_thermo_dat (%s)' % model,
+                               lambda model=model: read_thermo_dat(model, runDir, sample_int=args.sample_int)[1],
+                               args.repeat, rows=sum(len(each) for each in parse_files(paths, _parse_thermo_dat)),
+                               nbytes=size(paths)))
+
+    results.append(measure('read_data_vaps', lambda: read_data_vaps(runDir, sample_int=args.sample_int), args.repeat,
+                           rows=lines(vaps), nbytes=size(vaps)))
+    results.append(measure('read_thermo_csv', lambda: read_thermo_csv('export.csv', runDir=runDir, sample_int=args.sample_int),
+                           args.repeat, rows=lines([csv]), nbytes=size([csv])))
+    xlsxRows = len(pd.read_excel(xlsx, skiprows=1, usecols=[0]))
+    results.append(measure('read_thermo_xlsx', lambda: read_thermo_xlsx('export.xlsx', runDir=runDir, sample_int=args.sample_int,
+                           sidecar=False), args.repeat, rows=xlsxRows, nbytes=size([xlsx])))
+    results.append(measure('read_thermo_xlsx (sidecar)', lambda: read_thermo_xlsx('export.xlsx', runDir=runDir,
+                           sample_int=args.sample_int, sidecar=os.path.join(runDir, 'sidecar')), args.repeat, rows=xlsxRows,
+                           nbytes=size([xlsx])))
+
+    # Stages of read_thermo_dat on their own
+    frames = parse_files(files['nox'], _parse_thermo_dat)
+    nrows = sum(len(each) for each in frames)
+    results.append(measure('parse (nox)', lambda: parse_files(files['nox'], _parse_thermo_dat), args.repeat, rows=nrows,
+                           nbytes=size(files['nox'])))
+    results.append(measure('de-duplicate (nox)', lambda: merge_frames(frames), args.repeat, rows=nrows))
+
+    data = merge_frames(frames)
+    results.append(measure('resample (nox)', lambda: _resample(data, args.sample_int), args.repeat, rows=len(data)))
+    results.append(measure('diurnal (nox)', lambda: DiurnalProfile(['no', 'no2', 'nox']).update(data).result(),
+                           args.repeat, rows=len(data)))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--freq', default='10s', help='sampling interval of the analyzer files')
+    parser.add_argument('--vaps-freq', default='5s', help='sampling interval of the VAPS files')
+    parser.add_argument('--xlsx-days', type=int, default=1, help='days written to the .xlsx export')
+    parser.add_argument('--sample-int', default='1min')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', default='bench_results.json')
+    args = parser.parse_args()
+
+    runDir = tempfile.mkdtemp()
+    try:
+        results = run(runDir, args)
+    finally:
+        shutil.rmtree(runDir)
+
+    report = {
+            'created': pd.Timestamp.now().isoformat(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'args': vars(args),
+            'results': results,
+        }
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print('Wrote %s' % args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+	Generators for synthetic data files laid out like the ones ACT reads
+"""
+import os
+import numpy as np
+import pandas as pd
+
+# Columns written by each analyzer after the Time, Date and Flags columns
+THERMO_COLUMNS = {
+    '42I': ['no', 'no2', 'nox', 'hino', 'hino2', 'hinox', 'pres', 'smplf', 'ozonf', 'pmtt', 'intt', 'rctt', 'convt', 'pmtv'],
+    '43I': ['so2', 'hiso2', 'intt', 'rctt', 'smplfl', 'pres', 'pmtv', 'lmpi', 'lmpv'],
+    '49I': ['o3', 'hio3', 'cellai', 'cellbi', 'bncht', 'lmpt', 'o3lt', 'flowa', 'flowb', 'pres'],
+}
+
+# Typical values (mean, noise) used for each column
+THERMO_VALUES = {
+    'no': (5., 3.), 'no2': (12., 4.), 'nox': (17., 6.), 'hino': (5., 3.), 'hino2': (12., 4.), 'hinox': (17., 6.),
+    'so2': (2., 1.), 'hiso2': (2., 1.), 'o3': (35., 10.), 'hio3': (35., 10.),
+    'pres': (745., 2.), 'smplf': (0.7, 0.01), 'ozonf': (0.05, 0.001), 'smplfl': (0.5, 0.01),
+    'flowa': (0.7, 0.01), 'flowb': (0.7, 0.01), 'cellai': (90000., 500.), 'cellbi': (90000., 500.),
+    'pmtt': (-3., 0.1), 'intt': (32., 0.5), 'rctt': (50., 0.1), 'convt': (325., 1.), 'pmtv': (-700., 1.),
+    'bncht': (34., 0.3), 'lmpt': (53., 0.1), 'o3lt': (0., 0.), 'lmpi': (0.6, 0.01), 'lmpv': (1.2, 0.01),
+}
+
+MODELS = {'nox': '42I', 'sox': '43I', 'o3': '49I'}
+
+# Columns logged by the VAPS LabVIEW program after the Date/Time column
+VAPS_COLUMNS = ['6PV', '6PV/VL', 'Bank 0 Relay States', 'Bank 1 Relay States', 'CELL', 'Cell-6PV/VL', 'Cell-6PV/VL-GC',
+                'Heater', 'Hum-Cell/HT', 'Humidifier', 'Humidity', 'Qpurge', 'TC10_GC_AMS_transferline1',
+                'TC11_GC_AMS_transferline2', 'TC6_pretrap', 'TC7_trapin', 'TC8_oven', 'TC8_trapout', 'TC9_cell_joint',
+                'TC9_oven', 'TempHum', 'dPsmp']
+
+
+def _values(columns, n, rng):
+    return dict((col, THERMO_VALUES[col][0] + THERMO_VALUES[col][1] * rng.standard_normal(n)) for col in columns)
+
+
+def write_thermo_dat(runDir, model='nox', start='2013-08-05', days=1, freq='1min', overlap=10, seed=0):
+    '''
+        Writes one .dat file per day for a thermo scientific analyzer (nox, sox or o3) into `runDir`,
+        including the 4 + 5 lines before the header that read_thermo_dat skips. Each file starts
+        `overlap` samples before midnight so consecutive files share some rows, like the real ones.
+        Returns the list of file paths written.
+    '''
+    instrument = MODELS[model]
+    columns = THERMO_COLUMNS[instrument]
+    rng = np.random.RandomState(seed)
+    step = pd.Timedelta(freq)
+    timefmt = '%H:%M' if step % pd.Timedelta('1min') == pd.Timedelta(0) else '%H:%M:%S'
+
+    files = []
+    for day in pd.date_range(start, periods=days, freq='D'):
+        index = pd.date_range(day - overlap * step, day + pd.Timedelta('1D') - step, freq=step)
+
+        data = pd.DataFrame(_values(columns, len(index), rng), index=index, columns=columns)
+        data.insert(0, 'Flags', 'cc000000')
+        data.insert(0, 'Date', index.strftime('%m-%d-%y'))
+        data.insert(0, 'Time', index.strftime(timefmt))
+
+        filename = os.path.join(runDir, '%s %s %s.dat' % (instrument, day.strftime('%m%d%y'), '0000'))
+        with open(filename, 'w') as f:
+            f.write('%s %s\n' % (model, instrument.lower()))
+            f.write('Printed: %s\n' % day.strftime('%m-%d-%y %H:%M'))
+            f.write('Lrec format\n')
+            f.write('Data logging\n')
+            for i in range(5):
+                f.write('Rec %d\n' % i)
+            data.to_csv(f, sep=' ', index=False, float_format='%.4E', lineterminator='\n')
+
+        files.append(filename)
+
+    return files
+
+
+def _thermo_frame(model, start, days, freq, rng):
+    instrument = MODELS[model]
+    columns = THERMO_COLUMNS[instrument]
+    index = pd.date_range(start, periods=int(days * pd.Timedelta('1D') / pd.Timedelta(freq)), freq=freq, name='Date_Time')
+
+    return pd.DataFrame(_values(columns, len(index), rng), index=index, columns=columns)
+
+
+def write_thermo_csv(filename, model='nox', start='2013-08-05', days=1, freq='1min', seed=0):
+    '''
+        Writes a .csv export of a thermo scientific analyzer, indexed by timestamp like the files
+        read_thermo_csv reads. Returns the path written.
+    '''
+    data = _thermo_frame(model, start, days, freq, np.random.RandomState(seed))
+    data.to_csv(filename, float_format='%.4f')
+
+    return filename
+
+
+def write_thermo_xlsx(filename, model='nox', start='2013-08-05', days=1, freq='1min', seed=0, sheetname='Sheet1'):
+    '''
+        Writes a .xlsx export of a thermo scientific analyzer with a title row above the header,
+        like the workbooks read_thermo_xlsx reads (skiprows=1). Needs xlsxwriter. Returns the path written.
+    '''
+    data = _thermo_frame(model, start, days, freq, np.random.RandomState(seed))
+
+    with pd.ExcelWriter(filename, engine='xlsxwriter') as writer:
+        data.to_excel(writer, sheet_name=sheetname, startrow=1)
+        writer.sheets[sheetname].write(0, 0, '%s export' % MODELS[model])
+
+    return filename
+
+
+def write_vaps_txt(runDir, start='2013-04-28 14:03:05', days=1, freq='1s', short_every=5000, corrupt_every=20000, seed=0):
+    '''
+        Writes one tab-separated Vaps*.txt file per day into `runDir`, like the VAPS LabVIEW program
+        does. Every `short_every` rows one line is cut short (as when the program is stopped while
+        writing) and every `corrupt_every` rows one line gets extra fields, so the readers have to
+        deal with both. Returns the list of file paths written.
+    '''
+    rng = np.random.RandomState(seed)
+    start = pd.Timestamp(start)
+
+    files = []
+    for day in range(days):
+        # The first file starts at `start`, the next ones at midnight
+        first = start if day == 0 else start.normalize() + pd.Timedelta(days=day)
+        index = pd.date_range(first, first.normalize() + pd.Timedelta('1D'), freq=freq, inclusive='left')
+
+        values = 20. + 80. * rng.random_sample((len(index), len(VAPS_COLUMNS)))
+        lines = index.strftime('%m/%d/%Y %H:%M:%S').str.cat(
+                    ['\t'.join('%.4f' % v for v in row) for row in values], sep='\t').tolist()
+
+        for i in range(short_every - 1, len(lines), short_every):
+            lines[i] = lines[i][:rng.randint(1, 15)]
+        for i in range(corrupt_every - 1, len(lines), corrupt_every):
+            lines[i] = lines[i] + '\t0\t0'
+
+        filename = os.path.join(runDir, 'Vaps %s %s.txt' % (first.strftime('%m%d%y'), first.strftime('%H%M')))
+        with open(filename, 'w') as f:
+            f.write('\t'.join(['Date/Time'] + VAPS_COLUMNS) + '\n')
+            f.write('\n'.join(lines) + '\n')
+
+        files.append(filename)
+
+    return files
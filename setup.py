@@ -21,6 +21,6 @@ setup(name='ACT',
 	  install_requires=[
 		'pandas',
 		'numpy',
-		'xlrd'
+		'openpyxl'
 	  ],
       zip_safe=False)
\ No newline at end of file
@@ -0,0 +1,39 @@
+import os
+
+from ACT.thermo.cache import ParseCache
+from ACT.thermo.io import _parse_thermo_dat
+from ACT.thermo.prefetch import _read
+from generators import write_thermo_dat
+
+
+def test_prefetched_contents_of_a_growing_file(tmp_path):
+    path, = write_thermo_dat(str(tmp_path), 'nox', days=1)
+    os.makedirs(str(tmp_path / 'later'))
+    later, = write_thermo_dat(str(tmp_path / 'later'), 'nox', start='2013-08-06', days=1)
+    cache = ParseCache(str(tmp_path / 'cache'))
+
+    # The analyzer appends to the file after it was read ahead but before it is parsed
+    contents = _read(path)
+    with open(later) as f:
+        extra = f.readlines()[10:]
+    with open(path, 'a') as f:
+        f.writelines(extra)
+
+    short = cache.load(path, _parse_thermo_dat, contents=contents)
+    assert cache.info()['stale'].tolist() == [True]
+
+    full = cache.load(path, _parse_thermo_dat)
+    assert len(full) == len(short) + len(extra)
+    assert cache.info()['stale'].tolist() == [False]
+    assert len(cache.load(path, _parse_thermo_dat)) == len(full)
+
+
+def test_contents_that_do_not_match_the_file_are_not_cached(tmp_path):
+    path, = write_thermo_dat(str(tmp_path), 'nox', days=1)
+    cache = ParseCache(str(tmp_path / 'cache'))
+
+    with open(path, 'rb') as f:
+        contents = f.read()[:-200]
+
+    cache.load(path, _parse_thermo_dat, contents=contents)
+    assert len(cache.info()) == 0
@@ -0,0 +1,44 @@
+import warnings
+
+import pandas as pd
+import pytest
+
+from ACT.thermo.dat import parse_dat
+from ACT.thermo.io import _read_table_thermo_dat
+
+HEADER = 'nox 42i\nPrinted: 08-05-13 00:00\nLrec format\nData logging\n' + ''.join('Rec %d\n' % i for i in range(5))
+
+
+def _write(path, times, truncate=None):
+    lines = ['Time Date Flags no pmtt count']
+    for i, time in enumerate(times):
+        lines.append('%s 08-05-13 cc000000 %.4E %.1f %d' % (time, 5. + i, -3. + i / 10., (-1) ** i * (i + 2)))
+    text = HEADER + '\n'.join(lines) + '\n'
+    # The analyzer was still writing the last line, and stopped after a field or inside one
+    if truncate == 'field':
+        text = HEADER + '\n'.join(lines[:-1] + [' '.join(lines[-1].split()[:4])])
+    elif truncate == 'token':
+        text = text[:-12]
+    with open(path, 'w') as f:
+        f.write(text)
+    return str(path)
+
+
+def _compare(path):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = _read_table_thermo_dat(path)
+    pd.testing.assert_frame_equal(parse_dat(path), expected)
+
+
+@pytest.mark.parametrize('times', [['00:00', '00:01', '00:02', '00:03'],
+                                   ['00:00:00', '00:00:10', '00:00:20', '00:00:30']])
+def test_parse_dat_matches_read_table(tmp_path, times):
+    path = _write(tmp_path / '42I 080513 0000.dat', times)
+    assert parse_dat(path)['count'].dtype == 'int64'
+    _compare(path)
+
+
+@pytest.mark.parametrize('truncate', ['field', 'token'])
+def test_parse_dat_truncated_last_line(tmp_path, truncate):
+    _compare(_write(tmp_path / '42I 080513 0000.dat', ['00:00', '00:01', '00:02', '00:03'], truncate=truncate))
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from ACT.thermo.ingest import merge_frames
+
+
+def _frames(n, rows=60, overlap=5, shuffle=False):
+    # Consecutive files sharing their last `overlap` rows with the next one, like daily analyzer files
+    frames = []
+    for i in range(n):
+        index = pd.date_range('2013-08-05', periods=rows, freq='1min') + pd.Timedelta(minutes=i * (rows - overlap))
+        data = DataFrame({'file': i, 'value': np.arange(rows, dtype=float)}, index=index)
+        frames.append(data.sample(frac=1, random_state=i) if shuffle else data)
+    return frames
+
+
+def _expected(frames):
+    data = pd.concat(frames)
+    return data[~data.index.duplicated()]
+
+
+def test_merge_frames_matches_drop_duplicates():
+    frames = _frames(50)
+    pd.testing.assert_frame_equal(merge_frames(frames), _expected(frames), check_freq=False)
+
+
+def test_merge_frames_unsorted_and_nested():
+    frames = _frames(20, shuffle=True)
+    # A long frame covering many files, then files inside it and one empty frame
+    frames.insert(3, pd.concat(frames[5:12]).iloc[::3])
+    frames.insert(8, frames[1].iloc[:0])
+    frames.append(frames[0])
+    pd.testing.assert_frame_equal(merge_frames(frames), _expected(frames), check_freq=False)
+
+
+def test_merge_frames_empty():
+    assert len(merge_frames([])) == 0
+
+
+def test_merge_frames_categories():
+    frames = _frames(3)
+    frames = [each.assign(state=pd.Categorical(['a%d' % i] * len(each))) for i, each in enumerate(frames)]
+    merged = merge_frames(frames)
+    assert isinstance(merged['state'].dtype, pd.CategoricalDtype)
+    assert list(merged['state'].cat.categories) == ['a0', 'a1', 'a2']
+    pd.testing.assert_frame_equal(merged.astype({'state': object}), _expected(frames).astype({'state': object}), check_freq=False)
@@ -0,0 +1,63 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from ACT.thermo.io import FileIndex, RACY_SECONDS, read_thermo_dat, read_thermo_multi
+from generators import write_thermo_dat
+
+
+def test_read_thermo_multi_missing_analyzer(tmp_path):
+    write_thermo_dat(str(tmp_path), 'nox', days=2)
+    _, nox = read_thermo_dat('nox', runDir=str(tmp_path))
+
+    data = read_thermo_multi(runDir=str(tmp_path))
+    assert {'no', 'no2', 'nox', 'so2', 'o3'} <= set(data.columns)
+    assert data[['so2', 'o3']].isnull().all().all()
+    pd.testing.assert_series_equal(data['nox'], nox['nox'], check_freq=False)
+
+
+def test_read_thermo_multi_missing_first_analyzer(tmp_path):
+    write_thermo_dat(str(tmp_path), 'nox', days=1)
+    write_thermo_dat(str(tmp_path), 'o3', days=1)
+
+    data = read_thermo_multi(['sox', 'nox', 'o3'], runDir=str(tmp_path))
+    assert list(data.columns).index('so2') < list(data.columns).index('nox') < list(data.columns).index('o3')
+    assert len(data) > 0
+    assert data['so2'].isnull().all()
+    assert data[['nox', 'o3']].notnull().all().all()
+
+
+def test_read_thermo_multi_no_files(tmp_path):
+    data = read_thermo_multi(runDir=str(tmp_path), sample_int=None)
+    assert len(data) == 0
+    assert isinstance(data.index, pd.DatetimeIndex)
+
+
+def _touch(path):
+    open(path, 'w').close()
+
+
+def test_file_index_racy_mtime(tmp_path):
+    runDir = str(tmp_path)
+    _touch(os.path.join(runDir, '42I 080513 0000.dat'))
+    index = FileIndex(runDir)
+    assert index.query('42I', 'dat') == ['42I 080513 0000.dat']
+
+    # A second file created in the same tick as the scan leaves the directory mtime unchanged
+    mtime = os.stat(runDir).st_mtime_ns
+    _touch(os.path.join(runDir, '43I 080513 0000.dat'))
+    os.utime(runDir, ns=(mtime, mtime))
+    assert index.query('43I', 'dat') == ['43I 080513 0000.dat']
+
+
+def test_file_index_trusts_old_mtime(tmp_path):
+    runDir = str(tmp_path)
+    _touch(os.path.join(runDir, '42I 080513 0000.dat'))
+    old = time.time_ns() - 2 * RACY_SECONDS * 10**9
+    os.utime(runDir, ns=(old, old))
+
+    index = FileIndex(runDir)
+    assert index.query('42I', 'dat') == ['42I 080513 0000.dat']
+    assert index.mtime == old
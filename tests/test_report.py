@@ -0,0 +1,29 @@
+import os
+import warnings
+
+import matplotlib
+matplotlib.use('Agg')
+
+from ACT.thermo.report import render_report
+from generators import write_thermo_dat
+
+
+def test_render_report_missing_analyzer(tmp_path):
+    runDir, outDir = str(tmp_path / 'data'), str(tmp_path / 'out')
+    os.makedirs(runDir)
+    write_thermo_dat(runDir, 'nox', days=2)
+    write_thermo_dat(runDir, 'o3', days=2)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        paths = render_report(runDir, outDir, '8-5-2013', '8-6-2013', processes=1)
+
+    names = sorted(os.path.basename(path) for path in paths)
+    assert names == ['2013-08-05_debug_42I.png', '2013-08-05_debug_49I.png',
+                     '2013-08-06_debug_42I.png', '2013-08-06_debug_49I.png']
+    assert all(os.path.exists(path) for path in paths)
+
+    # The missing analyzer only skips the figures that need it
+    messages = [str(each.message) for each in caught]
+    assert sum('no sox data' in each for each in messages) == 2
+    assert sum('Could not render the diurnal plot' in each for each in messages) == 2
@@ -0,0 +1,17 @@
+from ACT.thermo.io import read_thermo_dat
+from ACT.thermo.trace import Tracer
+from generators import write_thermo_dat
+
+
+def test_memory_only_traced_on_the_tracer_thread(tmp_path):
+    write_thermo_dat(str(tmp_path), 'nox', days=3)
+
+    with Tracer(memory=True) as tracer:
+        read_thermo_dat('nox', runDir=str(tmp_path), prefetch=True)
+
+    table = tracer.table()
+    reads = table[table['stage'] == 'read']
+    assert len(reads) == 3
+    assert reads['peak_mb'].isnull().all()
+    assert table[table['stage'] == 'parse']['peak_mb'].notnull().all()
+    assert table[table['stage'] == 'merge']['peak_mb'].notnull().all()